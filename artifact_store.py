@@ -0,0 +1,96 @@
+import os
+import tempfile
+import threading
+import time
+
+from werkzeug.utils import safe_join
+
+
+# Directory of generated scripts. Writes are atomic (temp file, then rename), and a background sweeper
+# deletes artifacts older than `ttl` seconds, then the oldest ones while the total is over `max_bytes`.
+class ArtifactStore:
+    def __init__(self, root, ttl=24 * 3600, max_bytes=16 * 1024 * 1024):
+        self.root = os.path.abspath(root)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.swept = 0
+        self._sweeper = None
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    # `contents` is a str or an iterable of str chunks, written as they come.
+    def write(self, name, contents):
+        path = self.path(name)
+        if path is None:
+            raise ValueError(f"Invalid artifact name {name!r}.")
+        descriptor, temp_path = tempfile.mkstemp(dir=self.root, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, mode="w") as artifact:
+                if isinstance(contents, str):
+                    artifact.write(contents)
+                else:
+                    artifact.writelines(contents)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return name
+
+    # Absolute path of an artifact, or None when the name would resolve outside the store.
+    def path(self, name):
+        return safe_join(self.root, name)
+
+    def sweep(self):
+        now = time.time()
+        artifacts = []
+        for name, path, stat in self._entries():
+            if now - stat.st_mtime > self.ttl:
+                self._remove(path)
+            elif not name.startswith("."):
+                artifacts.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in artifacts)
+        for _, size, path in sorted(artifacts):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def metrics(self):
+        sizes = [stat.st_size for name, _, stat in self._entries() if not name.startswith(".")]
+        return {"count": len(sizes), "bytes": sum(sizes), "max_bytes": self.max_bytes, "ttl": self.ttl,
+                "swept": self.swept}
+
+    def start_sweeper(self, interval=300):
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_forever, args=(interval,), name="artifact-sweeper",
+                                             daemon=True)
+            self._sweeper.start()
+
+    def _sweep_forever(self, interval):
+        while True:
+            try:
+                self.sweep()
+            except OSError:
+                pass
+            time.sleep(interval)
+
+    # (name, path, stat) for every file in the store; files removed while scanning are skipped.
+    def _entries(self):
+        files = []
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        files.append((entry.name, entry.path, entry.stat()))
+                except FileNotFoundError:
+                    continue
+        return files
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        self.swept += 1
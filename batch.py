@@ -0,0 +1,179 @@
+import csv
+import io
+import json
+import re
+import tempfile
+import zipfile
+
+# errors.csv is kept in memory up to this many characters, then spooled to a temporary file.
+REPORT_SPOOL_SIZE = 256 * 1024
+
+
+# Write-only sink for ZipFile: collects what the archive writes until it is drained into the response.
+class _ZipChunks:
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+# The errors.csv report of a batch, one line per row, spooled to disk once it outgrows REPORT_SPOOL_SIZE.
+class _Report:
+    def __init__(self):
+        self._file = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_SIZE, mode="w+", encoding="utf-8",
+                                                   newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(["row", "status", "script_file", "errors"])
+
+    def add(self, row_number, status, script_file="", errors=""):
+        self._writer.writerow([row_number, status, script_file, errors])
+
+    # Copy the report into `archive` as errors.csv, yielding whatever the archive wrote to `chunks` as it goes.
+    def write_to(self, archive, chunks):
+        self._file.seek(0)
+        with archive.open("errors.csv", mode="w") as member:
+            for block in iter(lambda: self._file.read(REPORT_SPOOL_SIZE), ""):
+                member.write(block.encode())
+                yield chunks.drain()
+
+    def close(self):
+        self._file.close()
+
+
+def _describe(errors):
+    return "; ".join(f"{field}: {message}" for field, message in errors)
+
+
+# A CSV row that could not be read; it is reported in errors.csv instead of stopping the batch.
+class RowError:
+    def __init__(self, message):
+        self.message = message
+
+
+# Bytes that are not UTF-8 are decoded as lone surrogates (errors="surrogateescape"), so they can be found per row.
+_UNDECODABLE = re.compile("[\udc80-\udcff]")
+
+
+# Read batch rows from an uploaded CSV/JSON file or a JSON request body.
+# CSV rows are read lazily so large uploads are never held in memory at once; the header is read up front, so an
+# upload that is not a UTF-8 CSV file is rejected before the response starts. Rows that cannot be read later on
+# come out as RowError.
+def read_rows(upload=None, json_body=None):
+    if upload is not None:
+        if upload.filename.lower().endswith(".json") or upload.mimetype == "application/json":
+            rows = json.load(io.TextIOWrapper(upload.stream, encoding="utf-8-sig"))
+        else:
+            reader = csv.DictReader(io.TextIOWrapper(upload.stream, encoding="utf-8-sig", errors="surrogateescape",
+                                                     newline=""))
+            try:
+                fieldnames = reader.fieldnames
+            except csv.Error as error:
+                raise ValueError(f"Malformed CSV header: {error}.")
+            if any(_UNDECODABLE.search(name) for name in fieldnames or ()):
+                raise ValueError("CSV upload must be UTF-8 encoded.")
+            return _csv_rows(reader)
+    else:
+        rows = json_body
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ValueError("Batch input must be a list of objects.")
+    return rows
+
+
+def _csv_rows(reader):
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as error:
+            yield RowError(f"Malformed CSV row: {error}.")
+            continue
+        values = [value for key, value in row.items() for value in (value if key is None else [key, value])]
+        if any(isinstance(value, str) and _UNDECODABLE.search(value) for value in values):
+            yield RowError(f"CSV row at line {reader.line_num} is not valid UTF-8.")
+        else:
+            yield row
+
+
+# Normalize a row to the string values a browser form submission would carry.
+def normalize_row(row):
+    return {str(key).strip(): "" if value is None else str(value) for key, value in row.items() if key is not None}
+
+
+# Build the batch archive incrementally: one member per generated script, then errors.csv.
+# `results` yields ((script_file, contents), [(field, message), ...]) per row; `on_row` is told "ok" or "error" for every row.
+# Contents given as an iterable of str chunks (a StreamedScript) are compressed and sent chunk by chunk.
+# The report is spooled to disk, so what stays in memory per row is the member name (for duplicate detection and
+# the archive's central directory).
+def stream_zip(results, on_row=None):
+    chunks = _ZipChunks()
+    report = _Report()
+    seen = {}
+    try:
+        with zipfile.ZipFile(chunks, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for row_number, (script, errors) in enumerate(results, start=1):
+                if script is None:
+                    report.add(row_number, "error", errors=_describe(errors))
+                    if on_row:
+                        on_row("error")
+                    continue
+                script_file, contents = script
+                if script_file in seen:
+                    report.add(row_number, "error", script_file, f"Duplicate of row {seen[script_file]}.")
+                    if on_row:
+                        on_row("error")
+                    continue
+                seen[script_file] = row_number
+                if isinstance(contents, str):
+                    archive.writestr(script_file, contents)
+                else:
+                    with archive.open(script_file, mode="w") as member:
+                        for chunk in contents:
+                            member.write(chunk.encode())
+                            yield chunks.drain()
+                report.add(row_number, "ok", script_file)
+                if on_row:
+                    on_row("ok")
+                yield chunks.drain()
+            yield from report.write_to(archive, chunks)
+        yield chunks.drain()
+    finally:
+        report.close()
+
+
+# Archive with one consolidated script for all valid, distinct rows, then errors.csv.
+# `results` yields ({field: value}, []) or (None, [(field, message), ...]) per row; `consolidate` maps the list
+# of valid {field: value} mappings to the script contents.
+def consolidated_zip(results, script_file, consolidate):
+    chunks = _ZipChunks()
+    report = _Report()
+    seen = {}
+    try:
+        for row_number, (values, errors) in enumerate(results, start=1):
+            if values is None:
+                report.add(row_number, "error", errors=_describe(errors))
+                continue
+            key = tuple(values.items())
+            if key in seen:
+                report.add(row_number, "error", script_file, f"Duplicate of row {seen[key]}.")
+                continue
+            seen[key] = row_number
+            report.add(row_number, "ok", script_file)
+        with zipfile.ZipFile(chunks, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+            if seen:
+                archive.writestr(script_file, consolidate([dict(key) for key in seen]))
+            yield chunks.drain()
+            yield from report.write_to(archive, chunks)
+        yield chunks.drain()
+    finally:
+        report.close()
@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Offline benchmark suite: microbenchmarks for every *_script generator on synthetic SQL templates, and
+# end-to-end route benchmarks through the Flask test client. Results are written as JSON and can be
+# compared against an earlier run with --compare.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Synthetic template per sql_files/*.sql: (statement count, placeholders the real template uses).
+TEMPLATES = {
+    "rxp": (80, ["&&home_id", "&&fi_name", "&&sponsor_id", "&&bug_id"]),
+    "tn": (60, ["&&home_id", "&&fi_name", "&&bug_id"]),
+    "di_tn": (60, ["&&home_id", "&&fi_name", "&&bug_id"]),
+    "di_pop": (60, ["&&home_id", "&&fi_name", "&&bug_id"]),
+    "di_tn_pop": (100, ["&&home_id", "&&fi_name", "&&bug_id"]),
+    "rol": (70, ["&&home_id", "&&fi_name", "&&rtn", "&&bug_id"]),
+    "zelle_default": (400, ["&&home_id", "&&fi_name", "&&partner_id", "&&rtn", "&&bug_id", "&&csr_email",
+                            "&&reply_email", "&&csr_phone", "&&home_page", "&&ach", "&&qa_org", "&&cert_org",
+                            "&&stage_org", "&&prod_org", "&&pod_number", "&&cert_domain", "&&prod_domain",
+                            "&&danal", "&&verid", "&&custom_domain", "&&instant_connectivity"]),
+    "rxp_zelle": (300, ["&&home_id", "&&fi_name", "&&bug_id", "&&home_page", "&&qa_org", "&&cert_org",
+                        "&&stage_org", "&&prod_org", "&&pod_number", "&&cert_domain", "&&prod_domain", "&&danal",
+                        "&&custom_domain", "&&instant_connectivity"]),
+}
+
+FORMS = {
+    "rxp": {"home_id": "88831234", "fi_name": "Bench Bank", "sponsor_id": "SP01", "bug_id": "412345"},
+    "tn_coasp": {"home_id": "88121234", "fi_name": "Bench Bank", "bug_id": "412345"},
+    "tn_architect": {"home_id": "88141234", "fi_name": "Bench Bank", "bug_id": "412345"},
+    "tn_dna": {"home_id": "88111234", "fi_name": "Bench Bank", "bug_id": "412345"},
+    "di_tn": {"product": "TN", "home_id": "88881234", "fi_name": "Bench Bank", "bug_id": "412345"},
+    "di_pop": {"product": "POP", "home_id": "88881234", "fi_name": "Bench Bank", "bug_id": "412345"},
+    "di_tn_pop": {"product": "TN_POP", "home_id": "88881234", "fi_name": "Bench Bank", "bug_id": "412345"},
+    "rol": {"home_id": "88841234", "fi_name": "Bench Bank", "rtn": "123456789", "bug_id": "412345"},
+    "zelle": {"home_id": "88851234", "fi_name": "Bench Bank", "partner_id": "1234", "rtn": "123456789",
+              "bug_id": "412345", "csr_email": "donotreply_banking@fiserv.com",
+              "reply_email": "donotreply_banking@fiserv.com", "csr_phone": "8005551234",
+              "home_page": "https://www.example.com", "ach": "BENCH BANK", "qa_org": "QA1", "cert_org": "CE1",
+              "stage_org": "ST1", "prod_org": "PR1", "pod_number": "1",
+              "cert_domain": "https://cwp411-cert.checkfreeweb.com",
+              "prod_domain": "https://cwp411.checkfreeweb.com", "danal": "DANAL1", "verid": "CashEdge:Development",
+              "custom_domain": "true", "instant_connectivity": "ESF"},
+    "rxp_zelle": {"home_id": "88831234", "fi_name": "Bench Bank", "bug_id": "412345",
+                  "home_page": "https://www.example.com", "qa_org": "QA1", "cert_org": "CE1", "stage_org": "ST1",
+                  "prod_org": "PR1", "pod_number": "1", "cert_domain": "https://cwp411-cert.checkfreeweb.com",
+                  "prod_domain": "https://cwp411.checkfreeweb.com", "danal": "DANAL1", "custom_domain": "true",
+                  "instant_connectivity": "ESF"},
+}
+
+# Route, form values and the field to break for the invalid POST.
+ROUTES = {
+    "rxp": ("/RXP", FORMS["rxp"], "home_id"),
+    "tn": ("/TN", FORMS["tn_coasp"], "bug_id"),
+    "di": ("/DI", FORMS["di_tn_pop"], "home_id"),
+    "rol": ("/ROL", FORMS["rol"], "rtn"),
+    "zelle": ("/zelle", FORMS["zelle"], "home_page"),
+    "rxp_zelle": ("/rxp_zelle", FORMS["rxp_zelle"], "qa_org"),
+}
+
+
+def write_templates(directory):
+    generator = random.Random(0)
+    os.makedirs(directory)
+    for name, (statements, placeholders) in TEMPLATES.items():
+        lines = [f"-- {name} generated for &&fi_name, bug &&bug_id\n"]
+        for number in range(statements):
+            value = generator.choice(placeholders)
+            lines.append(f"UPDATE pct_table_{number % 23} SET config_value = '{value}', updated_by = 'BUG&&bug_id' "
+                         f"WHERE home_id = &&home_id AND config_key = 'key_{number}';\n")
+        lines.append("COMMIT;\n")
+        with open(os.path.join(directory, f"{name}.sql"), "w") as sql_file:
+            sql_file.write("".join(lines))
+
+
+def measure(operation, iterations, warmup=5):
+    for _ in range(warmup):
+        operation(0)
+    timings = []
+    started = time.perf_counter()
+    for iteration in range(iterations):
+        before = time.perf_counter()
+        operation(iteration)
+        timings.append(time.perf_counter() - before)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    allocation_peaks = []
+    # Fresh iterations, so allocations are measured on the same uncached path as the timings.
+    for iteration in range(iterations, iterations + min(iterations, 20)):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        operation(iteration)
+        allocation_peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / elapsed, 1),
+        "mean_us": round(statistics.fmean(timings) * 1e6, 1),
+        "p50_us": round(timings[len(timings) // 2] * 1e6, 1),
+        "p95_us": round(timings[int(len(timings) * 0.95) - 1] * 1e6, 1),
+        "p99_us": round(timings[int(len(timings) * 0.99) - 1] * 1e6, 1),
+        "peak_alloc_bytes": int(statistics.median(allocation_peaks)),
+    }
+
+
+# Every iteration uses a different bug ID, so the result cache is exercised as it is in production.
+def generator_benchmarks(main, iterations):
+    def call(script, form, *fields):
+        return lambda i: script(*(str(412345 + i) if field == "bug_id" else form[field] for field in fields))
+
+    fields = {name: product.script_args for name, product in main.PRODUCTS.items()}
+    return {
+        "rxp_script": call(main.rxp_script, FORMS["rxp"], *fields["rxp"]),
+        "tn_script[8812]": call(main.tn_script, FORMS["tn_coasp"], *fields["tn"]),
+        "tn_script[8814]": call(main.tn_script, FORMS["tn_architect"], *fields["tn"]),
+        "tn_script[8811]": call(main.tn_script, FORMS["tn_dna"], *fields["tn"]),
+        "di_script[TN]": call(main.di_script, FORMS["di_tn"], *fields["di"]),
+        "di_script[POP]": call(main.di_script, FORMS["di_pop"], *fields["di"]),
+        "di_script[TN_POP]": call(main.di_script, FORMS["di_tn_pop"], *fields["di"]),
+        "rol_script": call(main.rol_script, FORMS["rol"], *fields["rol"]),
+        "zelle_script": call(main.zelle_script, FORMS["zelle"], *fields["zelle"]),
+        "rxp_zelle_script": call(main.rxp_zelle_script, FORMS["rxp_zelle"], *fields["rxp_zelle"]),
+    }
+
+
+def route_benchmarks(main, client):
+    def get(path):
+        return lambda i: expect(client.get(path), 200)
+
+    # A fresh bug_id per iteration, then `broken_field` (if any) set to an invalid value: that page must not
+    # offer a download.
+    def post(path, form, broken_field=None):
+        def run(i):
+            data = dict(form, bug_id=str(412345 + i))
+            if broken_field is None:
+                return expect(client.post(path, data=data), 200)
+            data[broken_field] = "x"
+            response = client.post(path, data=data)
+            if "/download/" in response.get_data(as_text=True):
+                raise AssertionError(f"{path} accepted an invalid {broken_field}")
+            expect(response, 200)
+        return run
+
+    def download(path, form):
+        page = client.post(path, data=form).get_data(as_text=True)
+        link = re.search(r'href="(/download/[^"]+)"', page).group(1)
+        return lambda i: expect(client.get(link), 200)
+
+    benchmarks = {"GET /": get("/")}
+    for product, (path, form, broken_field) in ROUTES.items():
+        benchmarks[f"GET {path}"] = get(path)
+        benchmarks[f"POST {path} valid"] = post(path, form)
+        benchmarks[f"POST {path} invalid"] = post(path, form, broken_field)
+        benchmarks[f"GET /download ({product})"] = download(path, form)
+        benchmarks[f"POST /api/v1/{product}"] = (
+            lambda i, product=product, form=form: expect(
+                client.post(f"/api/v1/{product}", json=dict(form, bug_id=str(412345 + i))), 200))
+    return benchmarks
+
+
+def expect(response, status):
+    response.get_data()
+    if response.status_code != status:
+        raise AssertionError(f"{response.request.path} returned {response.status_code}, expected {status}")
+    response.close()
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Print per-benchmark changes against an earlier results file and return the names that regressed.
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)["results"]
+    regressions = []
+    print(f"{'benchmark':42} {'ops/s':>10} {'change':>8} {'p99 change':>11} {'alloc change':>13}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        throughput = current["ops_per_sec"] / previous["ops_per_sec"] - 1
+        latency = current["p99_us"] / previous["p99_us"] - 1
+        allocations = (current["peak_alloc_bytes"] + 1) / (previous["peak_alloc_bytes"] + 1) - 1
+        flag = ""
+        if throughput < -threshold or latency > threshold or allocations > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:42} {current['ops_per_sec']:>10} {throughput:>+8.1%} {latency:>+11.1%} {allocations:>+13.1%}"
+              f"{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the script generators and Flask routes.")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--iterations", type=int, default=500, help="iterations per generator benchmark")
+    parser.add_argument("--route-iterations", type=int, default=100, help="iterations per route benchmark")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative change counted as a regression (default 0.10)")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    work_dir = tempfile.mkdtemp(prefix="pct_benchmark_")
+    try:
+        write_templates(os.path.join(work_dir, "sql_files"))
+        os.environ["ARTIFACT_DIR"] = os.path.join(work_dir, "generated")
+        os.environ["HISTORY_DB"] = os.path.join(work_dir, "history.sqlite3")
+        os.chdir(work_dir)
+        sys.path.insert(0, APP_DIR)
+        import main as app_module
+        app_module.app.config["WTF_CSRF_ENABLED"] = False
+        client = app_module.app.test_client()
+
+        suites = [(generator_benchmarks(app_module, args.iterations), args.iterations),
+                  (route_benchmarks(app_module, client), args.route_iterations)]
+        results = {}
+        for benchmarks, iterations in suites:
+            for name, operation in benchmarks.items():
+                if args.filter and args.filter not in name:
+                    continue
+                results[name] = measure(operation, iterations)
+                print(f"{name:42} {results[name]['ops_per_sec']:>10} ops/s  p99 {results[name]['p99_us']:>9} us")
+    finally:
+        os.chdir(APP_DIR)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(output, "w") as output_file:
+        json.dump({"revision": git_revision(), "python": platform.python_version(), "platform": platform.platform(),
+                   "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "results": results}, output_file, indent=2)
+    print(f"Results written to {output}")
+    if baseline and compare(results, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,2 @@
-pip3 download -r requirements.txt --no-binary=:all: -d vendor
\ No newline at end of file
+pip3 download -r requirements.txt --no-binary=:all: -d vendor
+python3 main.py precompile
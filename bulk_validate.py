@@ -0,0 +1,120 @@
+import re
+
+import email_validator
+from wtforms import IntegerField, SelectField
+from wtforms.validators import Email, URL
+
+# Key for a field that is absent from a row (as opposed to submitted empty).
+_MISSING = object()
+
+
+# One FieldSpec compiled to a plain function of the submitted value: returns the tuple of error messages
+# WTForms would report for the field, reproducing its processing (int coercion, select choices, defaults),
+# the DataRequired/NumberRange/Length/Email/URL/Regexp chain and their default messages.
+class FieldCheck:
+    def __init__(self, spec):
+        self.integer = issubclass(spec.kind, IntegerField)
+        self.choices = {str(choice) for choice in spec.choices} if issubclass(spec.kind, SelectField) else None
+        self.default = '' if spec.default is None else spec.default
+        self.required = 'This field is required.' if spec.required is True else spec.required
+        self.number_range = None
+        if spec.number_range:
+            minimum, maximum, message = spec.number_range
+            message = message or 'Number must be between %(min)s and %(max)s.'
+            self.number_range = (minimum, maximum, message % dict(min=minimum, max=maximum))
+        self.length = None
+        if spec.length:
+            minimum, maximum, message = spec.length
+            if message is None and minimum == maximum:
+                message = 'Field must be exactly %(max)d character long.' if maximum == 1 else \
+                    'Field must be exactly %(max)d characters long.'
+            elif message is None:
+                message = 'Field must be between %(min)d and %(max)d characters long.'
+            self.length = (minimum, maximum, message)
+        self.email = Email() if spec.email else None
+        self.url = URL(message=spec.url) if spec.url else None
+        self.regexp = (re.compile(spec.regexp[0]), spec.regexp[1]) if spec.regexp else None
+
+    def __call__(self, value):
+        errors = []
+        if self.integer:
+            data = None
+            if value is not _MISSING:
+                try:
+                    data = int(value)
+                except ValueError:
+                    errors.append('Not a valid integer value')
+        elif self.choices is not None:
+            data = None if value is _MISSING else value
+            if data not in self.choices:
+                errors.append('Not a valid choice')
+        else:
+            data = self.default if value is _MISSING else value
+        if not data or isinstance(data, str) and not data.strip():
+            return (self.required,)
+        if self.number_range:
+            minimum, maximum, message = self.number_range
+            if data < minimum or data > maximum:
+                errors.append(message)
+        if self.length:
+            minimum, maximum, message = self.length
+            if not minimum <= len(data) <= maximum:
+                errors.append(message % dict(min=minimum, max=maximum, length=len(data)))
+        if self.email:
+            try:
+                email_validator.validate_email(data, check_deliverability=self.email.check_deliverability,
+                                               allow_smtputf8=self.email.allow_smtputf8,
+                                               allow_empty_local=self.email.allow_empty_local)
+            except email_validator.EmailNotValidError:
+                errors.append(self.email.message or 'Invalid email address.')
+        if self.url:
+            match = self.url.regex.match(data)
+            if not match or not self.url.validate_hostname(match.group('host')):
+                errors.append(self.url.message)
+        if self.regexp:
+            pattern, message = self.regexp
+            if not pattern.match(data):
+                errors.append(message)
+        return tuple(errors)
+
+
+# Validates a whole chunk of batch rows for one product, column by column. Each distinct value of a column
+# is checked once, so the repeated values typical of a batch (org IDs, domains, emails) cost a dict lookup.
+class BulkValidator:
+    def __init__(self, product):
+        self.product = product
+        self.checks = {field: FieldCheck(spec) for field, spec in product.field_specs.items()}
+        self.defaults = {field: spec.default for field, spec in product.field_specs.items()
+                         if spec.default is not None}
+
+    # Error matrix of a chunk: {field: [error messages of row 0, of row 1, ...]}.
+    def check_columns(self, rows):
+        matrix = {}
+        for field, check in self.checks.items():
+            verdicts = {}
+            column = []
+            for row in rows:
+                value = row.get(field, _MISSING)
+                errors = verdicts.get(value)
+                if errors is None:
+                    errors = verdicts[value] = check(value)
+                column.append(errors)
+            matrix[field] = column
+        return matrix
+
+    # [(field, message), ...] for every row, in the order the product form reports them. Rows that pass
+    # but have no template (e.g. a TN home ID outside the 8811/8812/8814 prefixes) get the product's rejection.
+    def validate(self, rows):
+        columns = list(self.check_columns(rows).items())
+        rejection = self.product.rejection
+        results = []
+        for index, row in enumerate(rows):
+            errors = [(field, message) for field, column in columns for message in column[index]]
+            if not errors and rejection and self.product.variant(row) not in self.product.templates:
+                errors.append(rejection[:2])
+            results.append(errors)
+        return results
+
+    # The {field: value} mapping a valid row generates its script from; absent fields take the form default.
+    def values(self, row):
+        return {field: row[field] if field in row else self.defaults.get(field) for field in self.product.fields}
@@ -1,2 +1,3 @@
 rm -rf ./vendor/*
-rm -rf __pycache__
\ No newline at end of file
+rm -rf __pycache__
+rm -rf generated
\ No newline at end of file
@@ -0,0 +1,27 @@
+import os
+import tempfile
+
+import pytest
+
+# main.py creates its artifact directory and history database on import; keep them out of the checkout.
+_work_dir = tempfile.mkdtemp(prefix="pct_tests_")
+os.environ["ARTIFACT_DIR"] = os.path.join(_work_dir, "generated")
+os.environ["HISTORY_DB"] = os.path.join(_work_dir, "history.sqlite3")
+
+import consolidate  # noqa: E402
+import sql_template  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+
+
+# Empty sql_files/ directory in a fresh working directory, with empty template and result caches, so each test
+# renders the templates it wrote itself.
+@pytest.fixture
+def sql_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sql_template, "template_cache", sql_template.TemplateCache())
+    monkeypatch.setattr(sql_template, "result_cache", ResultCache())
+    monkeypatch.setattr(consolidate, "consolidated_cache",
+                        sql_template.TemplateCache(compile=consolidate.ConsolidatedTemplate))
+    directory = tmp_path / "sql_files"
+    directory.mkdir()
+    return directory
@@ -0,0 +1,169 @@
+import re
+
+from sql_template import HOME_ID, RTN, SPONSOR_ID, PLACEHOLDERS, SqlTemplate, TemplateCache
+
+# Placeholders that identify an FI; statements filtered on them are merged into IN-lists.
+KEY_PLACEHOLDERS = (HOME_ID, RTN, SPONSOR_ID)
+
+# Stand-in for the key predicate while rows are grouped by the rest of the statement text.
+_KEY_SLOT = "\0"
+_KEY = "|".join(re.escape(placeholder) for placeholder in KEY_PLACEHOLDERS)
+# `column = &&key` or `column = '&&key'`.
+_PREDICATE = re.compile(rf"([\w.]+)\s*=\s*('?)({_KEY})(?!\w)\2")
+_AND = re.compile(r"\s+AND\s+", re.IGNORECASE)
+# Key predicates are only looked for after the statement's first WHERE or ON, outside string literals: a
+# `column = &&key` in a SET clause or a VALUES list is an assignment, not a filter.
+_FILTER_CLAUSE = re.compile(r"\b(WHERE|ON)\b", re.IGNORECASE)
+_STRING = re.compile(r"'[^']*'")
+_TRANSACTION_END = re.compile(r"(COMMIT|ROLLBACK)(\s+WORK)?", re.IGNORECASE)
+# SQL*Plus EXIT/QUIT, with or without a return code.
+_SESSION_END = re.compile(r"(EXIT|QUIT)\b.*", re.IGNORECASE | re.DOTALL)
+# PL/SQL blocks and DDL statements.
+_UNSUPPORTED = re.compile(r"(BEGIN|DECLARE|CREATE|ALTER|DROP|TRUNCATE|RENAME|GRANT|REVOKE|COMMENT)\b",
+                          re.IGNORECASE)
+
+
+# Split SQL text into statements on `;` outside quoted strings, dropping comments and SQL*Plus `/` lines.
+def split_statements(text):
+    statements = []
+    current = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == "'":
+            end = text.find("'", index + 1)
+            end = len(text) - 1 if end == -1 else end
+            current.append(text[index:end + 1])
+            index = end + 1
+            continue
+        if text.startswith("--", index):
+            end = text.find("\n", index)
+            index = len(text) if end == -1 else end
+            continue
+        if text.startswith("/*", index):
+            end = text.find("*/", index + 2)
+            index = len(text) if end == -1 else end + 2
+            continue
+        if char == ";":
+            statements.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+        index += 1
+    statements.append("".join(current))
+    lines = ("\n".join(line for line in statement.splitlines() if line.strip() and line.strip() != "/")
+             for statement in statements)
+    return [statement for statement in lines if statement]
+
+
+# One statement of a template. When its only use of the key placeholders is a single `column = &&key`
+# predicate (or an AND-chain of them) in its WHERE or ON clause, rows whose statements differ only in that
+# predicate are merged.
+class _Statement:
+    def __init__(self, text, placeholders):
+        clause = _FILTER_CLAUSE.search(_STRING.sub(lambda match: " " * len(match.group()), text))
+        predicates = list(_PREDICATE.finditer(text, clause.end())) if clause else []
+        chains = []
+        for match in predicates:
+            if chains and _AND.fullmatch(text[chains[-1][-1].end():match.start()]):
+                chains[-1].append(match)
+            else:
+                chains.append([match])
+        keyed = len(chains) == 1 and len(re.findall(_KEY, text)) == len(predicates)
+        self.key = [(match.group(1), match.group(2), match.group(3)) for match in chains[0]] if keyed else None
+        if keyed:
+            text = text[:chains[0][0].start()] + _KEY_SLOT + text[chains[0][-1].end():]
+        self.shape = SqlTemplate(text, placeholders)
+
+    # Statements for `rows` ({placeholder: value} mappings), in row order. Keyed statements of rows that differ
+    # only in their keys are merged into one per `in_list_size` keys; a key repeated by several rows is merged
+    # into as many statements, so it runs as often as in the per-FI scripts. Statements without a key predicate
+    # are not merged at all: each row runs its own copy, as non-idempotent ones (`SET n = n + 1`) require.
+    def render(self, rows, in_list_size):
+        if not self.key:
+            for values in rows:
+                yield self.shape.render(values)
+            return
+        groups = {}
+        for values in rows:
+            keys = groups.setdefault(self.shape.render(values), {})
+            key = tuple(values.get(placeholder, placeholder) for _, _, placeholder in self.key)
+            keys[key] = keys.get(key, 0) + 1
+        for shape, keys in groups.items():
+            for repeat in range(max(keys.values())):
+                round_keys = [key for key, count in keys.items() if count > repeat]
+                for start in range(0, len(round_keys), in_list_size):
+                    yield shape.replace(_KEY_SLOT, self._filter(round_keys[start:start + in_list_size]))
+
+    def _filter(self, keys):
+        if len(self.key) == 1:
+            column, quote, _ = self.key[0]
+            if len(keys) == 1:
+                return f"{column} = {quote}{keys[0][0]}{quote}"
+            return f"{column} IN ({', '.join(quote + key + quote for key, in keys)})"
+        conditions = [" AND ".join(f"{column} = {quote}{value}{quote}"
+                                   for (column, quote, _), value in zip(self.key, key)) for key in keys]
+        if len(conditions) == 1:
+            return conditions[0]
+        return "(" + " OR ".join(f"({condition})" for condition in conditions) + ")"
+
+
+# Raised for a template whose statements cannot run inside one shared transaction.
+class ConsolidationError(ValueError):
+    pass
+
+
+# A per-FI template compiled for consolidated output: its statements without the per-FI COMMITs, and without
+# a closing EXIT/QUIT, which is kept in `exit` to end the consolidated script once. PL/SQL blocks and DDL (which
+# Oracle commits implicitly) cannot be part of a single transaction, and an EXIT followed by more statements
+# would end the session after the first FI, so templates containing them raise ConsolidationError instead.
+class ConsolidatedTemplate:
+    def __init__(self, text, placeholders=PLACEHOLDERS, version=None):
+        self.version = version
+        statements = [statement.strip() for statement in split_statements(text)]
+        for statement in statements:
+            if _UNSUPPORTED.match(statement):
+                raise ConsolidationError(f"`{statement.splitlines()[0]}` cannot run inside a single transaction")
+        self.exit = None
+        if statements and _SESSION_END.fullmatch(statements[-1]):
+            self.exit = statements.pop()
+        for statement in statements:
+            if _SESSION_END.fullmatch(statement):
+                raise ConsolidationError(f"`{statement.splitlines()[0]}` ends the session, so the statements after it "
+                                         f"cannot run inside a single transaction")
+        self.statements = [_Statement(statement, placeholders) for statement in statements
+                           if not _TRANSACTION_END.fullmatch(statement)]
+
+    # Statements for all rows ({placeholder: value} mappings): each template statement in turn, with rows
+    # that only differ in their keys merged into IN-lists of at most `in_list_size` entries.
+    def render(self, rows, in_list_size):
+        return [sql for statement in self.statements for sql in statement.render(rows, in_list_size)]
+
+
+consolidated_cache = TemplateCache(compile=ConsolidatedTemplate)
+
+
+# Compiled template at `path`; raises ConsolidationError, naming the file, when it cannot be consolidated.
+def consolidated_template(path):
+    try:
+        return consolidated_cache.get(path)
+    except ConsolidationError as error:
+        raise ConsolidationError(f"{path}: {error}.") from None
+
+
+# One script for a batch of FIs: `groups` is [(template path, [{placeholder: value}, ...]), ...].
+# Every statement runs inside a single transaction, committed once at the end; the first EXIT/QUIT that ended a
+# template follows that COMMIT. Per-FI statements are assumed to
+# touch only that FI's rows, so running them statement by statement instead of FI by FI gives the same result.
+def consolidated_sql(groups, in_list_size=1000):
+    lines = [f"-- Consolidated script for {sum(len(rows) for _, rows in groups)} FIs."]
+    session_end = None
+    for path, rows in groups:
+        template = consolidated_template(path)
+        session_end = session_end or template.exit
+        lines.append(f"\n-- {path}: " + ", ".join(str(values.get(HOME_ID, "")) for values in rows))
+        lines += [sql + ";" for sql in template.render(rows, in_list_size)]
+    lines.append("\nCOMMIT;")
+    if session_end:
+        lines.append(session_end + ";")
+    return "\n".join(lines) + "\n"
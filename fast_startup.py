@@ -0,0 +1,43 @@
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+import types
+
+# FAST_STARTUP=1 shortens restarts and scaling events on small instances: modules only a validator call needs are
+# loaded on first use instead of at import, and page templates come from the precompiled cache (see main.py).
+enabled = os.getenv("FAST_STARTUP", "0") == "1"
+
+# email_validator imports dnspython, the largest import of the app, but is only used to check an email address.
+LAZY_MODULES = ("email_validator",)
+
+
+# Stand-in for a module in sys.modules; the first attribute lookup imports the real module and copies its namespace.
+# (importlib's LazyLoader does not help here: the import statement itself reads __spec__, which triggers the load.)
+class _LazyModule(types.ModuleType):
+    _lock = threading.Lock()
+
+    def __getattr__(self, attribute):
+        with self._lock:
+            if sys.modules.get(self.__name__) is self:
+                del sys.modules[self.__name__]
+                try:
+                    module = importlib.import_module(self.__name__)
+                except BaseException:
+                    sys.modules[self.__name__] = self
+                    raise
+                self.__dict__.update(module.__dict__)
+        return object.__getattribute__(self, attribute)
+
+
+# Register `name` so that importing it costs nothing until one of its attributes is used.
+def lazy_import(name):
+    if name not in sys.modules and importlib.util.find_spec(name) is not None:
+        sys.modules[name] = _LazyModule(name)
+    return sys.modules.get(name)
+
+
+if enabled:
+    for lazy_module in LAZY_MODULES:
+        lazy_import(lazy_module)
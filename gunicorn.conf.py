@@ -0,0 +1,33 @@
+import gc
+import os
+
+# Production WSGI settings, sized for the 64M Cloud Foundry instance in manifest.yml.
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+# One preloaded worker plus the master measures about 56M PSS, so a second worker needs a larger instance.
+# SCRIPT_STORAGE=memory downloads and /jobs state live inside a worker process, so more workers are refused at
+# startup (see on_starting) rather than answering 404 for tokens and jobs held by another worker.
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+threads = int(os.getenv("WEB_THREADS", 4))
+worker_class = "gthread"
+# Import the app and compile its templates once in the master, then fork workers that share those pages.
+preload_app = True
+timeout = int(os.getenv("WEB_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 20))
+keepalive = int(os.getenv("WEB_KEEPALIVE", 5))
+# No max_requests: recycling the worker would drop the /jobs registry (and kill running jobs), SCRIPT_STORAGE=memory
+# downloads and the result cache along with it.
+accesslog = "-"
+
+
+def on_starting(server):
+    if server.cfg.workers > 1:
+        raise RuntimeError(f"{server.cfg.workers} workers requested, but downloads kept in memory and /jobs state "
+                           "are held by a single worker process; run one worker and scale with WEB_THREADS.")
+
+
+def when_ready(server):
+    import main
+    main.warm_up()
+    # Move everything loaded so far out of the collector's reach, so the garbage collector
+    # does not touch (and un-share) the preloaded pages in every forked worker.
+    gc.freeze()
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generation (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    product TEXT NOT NULL,
+    home_id INTEGER,
+    bug_id INTEGER,
+    fi_name TEXT COLLATE NOCASE,
+    script_file TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    params TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS generation_home_id ON generation (home_id);
+CREATE INDEX IF NOT EXISTS generation_bug_id ON generation (bug_id);
+CREATE INDEX IF NOT EXISTS generation_product ON generation (product);
+CREATE INDEX IF NOT EXISTS generation_fi_name ON generation (fi_name);
+CREATE INDEX IF NOT EXISTS generation_created_at ON generation (created_at);
+"""
+
+# Columns that can be filtered on with equality, and their types.
+FILTERS = {"home_id": int, "bug_id": int, "product": str, "fi_name": str}
+
+
+def _integer(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _sha256(contents):
+    if isinstance(contents, str):
+        return hashlib.sha256(contents.encode()).hexdigest()
+    return contents.sha256()
+
+
+# Record of generated scripts in a local SQLite file, indexed by home ID, bug ID, product, FI name
+# (case-insensitive) and time. Each write prunes entries older than `ttl` seconds and all but the newest
+# `max_rows`, so the file stays within the instance's disk quota (SQLite reuses the freed pages).
+# Each process opens its own connection on first use, so the store can be created before gunicorn forks;
+# WAL mode lets the workers write while others read.
+class HistoryStore:
+    def __init__(self, path, max_rows=None, ttl=None):
+        self.path = path
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    # Record generated scripts: `entries` is [(product, {field: value}, script_file, contents), ...], where contents
+    # is the script text or a StreamedScript that has been (or is about to be) consumed.
+    def record(self, entries):
+        now = time.time()
+        rows = [(now, product, _integer(values.get("home_id")), _integer(values.get("bug_id")), values.get("fi_name"),
+                 script_file, _sha256(contents), json.dumps(values, sort_keys=True))
+                for product, values, script_file, contents in entries]
+        if not rows:
+            return
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany("INSERT INTO generation (created_at, product, home_id, bug_id, fi_name, "
+                                       "script_file, sha256, params) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                if self.ttl is not None:
+                    connection.execute("DELETE FROM generation WHERE created_at < ?", (now - self.ttl,))
+                if self.max_rows is not None:
+                    connection.execute("DELETE FROM generation WHERE id <= (SELECT id FROM generation "
+                                       "ORDER BY id DESC LIMIT 1 OFFSET ?)", (self.max_rows,))
+
+    # Newest entries first matching the equality `filters` and the optional time range, at most `limit` of them,
+    # starting below the entry ID `before` (the cursor returned for the previous page).
+    # Returns (entries, cursor of the next page or None).
+    def search(self, filters=None, since=None, until=None, before=None, limit=50):
+        clauses = []
+        arguments = []
+        for column, value in (filters or {}).items():
+            clauses.append(f"{column} = ?")
+            arguments.append(value)
+        for clause, value in (("created_at >= ?", since), ("created_at < ?", until), ("id < ?", before)):
+            if value is not None:
+                clauses.append(clause)
+                arguments.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            cursor = self._connect().execute(
+                f"SELECT id, created_at, product, home_id, bug_id, fi_name, script_file, sha256, params "
+                f"FROM generation {where} ORDER BY id DESC LIMIT ?", arguments + [limit + 1])
+            rows = cursor.fetchall()
+        entries = [{"id": row[0], "created_at": row[1], "product": row[2], "home_id": row[3], "bug_id": row[4],
+                    "fi_name": row[5], "script_file": row[6], "sha256": row[7], "params": json.loads(row[8])}
+                   for row in rows[:limit]]
+        return entries, entries[-1]["id"] if len(rows) > limit else None
+
+    def _connect(self):
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
@@ -0,0 +1,104 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import zlib
+
+from flask import Response, abort
+from werkzeug.wsgi import ClosingIterator
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Bodies smaller than this are sent as they are: gzip saves a few bytes at best and can make them bigger.
+MIN_GZIP_SIZE = 512
+
+
+def accepts_gzip(request):
+    return request.accept_encodings["gzip"] > 0
+
+
+# Gzip a response body in place when the client accepts it. Streamed bodies (files from send_from_directory, scripts
+# rendered chunk by chunk) are compressed as they are sent, so they are never read into memory whole. Partial and
+# conditional responses are left as they are. The ETag gets a "-gzip" suffix, and the conditional check runs again
+# against it, so a client revalidating the compressed body still gets its 304.
+def gzip_response(response, request, level=6):
+    response.vary.add("Accept-Encoding")
+    if response.status_code != 200 or "Content-Encoding" in response.headers or not accepts_gzip(request):
+        return response
+    if response.is_streamed:
+        if response.content_length is not None and response.content_length < MIN_GZIP_SIZE:
+            return response
+        body = response.response
+        _gzip_headers(response)
+        response.make_conditional(request)
+        if response.status_code != 200:
+            if hasattr(body, "close"):
+                body.close()
+            return response
+        response.response = ClosingIterator(_gzip_stream(response.iter_encoded(), level),
+                                            getattr(body, "close", None))
+        response.direct_passthrough = False
+        return response
+    data = response.get_data()
+    if len(data) < MIN_GZIP_SIZE:
+        return response
+    _gzip_headers(response)
+    response.set_data(gzip.compress(data, compresslevel=level, mtime=0))
+    return response.make_conditional(request)
+
+
+def _gzip_headers(response):
+    response.headers["Content-Encoding"] = "gzip"
+    response.headers.pop("Accept-Ranges", None)
+    response.headers.pop("Content-Length", None)
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + "-gzip", weak)
+
+
+# Gzip stream of `chunks`; wbits 31 writes the gzip header and trailer.
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# Files under static/ served under content-hashed names (css/styles.css -> css/styles.<hash>.css), so browsers can
+# cache them for good: a changed file gets a new URL. Every file is read and gzipped once, when the app starts.
+class StaticAssets:
+    def __init__(self, root):
+        self.urls = {}
+        self._files = {}
+        for directory, _, names in os.walk(root):
+            for name in names:
+                with open(os.path.join(directory, name), "rb") as asset:
+                    data = asset.read()
+                path = os.path.relpath(os.path.join(directory, name), root).replace(os.sep, "/")
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                stem, extension = os.path.splitext(path)
+                fingerprinted = f"{stem}.{digest}{extension}"
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                self.urls[path] = fingerprinted
+                self._files[fingerprinted] = (mimetypes.guess_type(name)[0] or "application/octet-stream", data,
+                                              compressed if len(compressed) < len(data) else None, digest)
+
+    # Fingerprinted name of a static file; unknown paths are returned unchanged.
+    def fingerprinted(self, path):
+        return self.urls.get(path, path)
+
+    def response(self, name, request):
+        entry = self._files.get(name)
+        if entry is None:
+            abort(404)
+        mimetype, data, compressed, digest = entry
+        gzipped = compressed is not None and accepts_gzip(request)
+        response = Response(compressed if gzipped else data, mimetype=mimetype)
+        if compressed is not None:
+            response.vary.add("Accept-Encoding")
+        if gzipped:
+            response.headers["Content-Encoding"] = "gzip"
+        response.headers["Cache-Control"] = IMMUTABLE
+        response.set_etag(digest + "-gzip" if gzipped else digest)
+        return response.make_conditional(request)
@@ -0,0 +1,115 @@
+import os
+import secrets
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobLimitError(Exception):
+    pass
+
+
+# A background batch generation job and its per-row progress.
+class Job:
+    def __init__(self, product, total):
+        self.id = secrets.token_urlsafe(12)
+        self.product = product
+        self.status = "queued"
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.error = None
+        self.result_path = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return self.total - self.done - self.failed
+
+    def record(self, status):
+        with self._lock:
+            if status == "ok":
+                self.done += 1
+            else:
+                self.failed += 1
+
+    def to_dict(self):
+        return {"id": self.id, "product": self.product, "status": self.status,
+                "rows": {"total": self.total, "done": self.done, "failed": self.failed, "pending": self.pending},
+                "error": self.error}
+
+
+# Runs batch jobs on a bounded thread pool. At most `max_jobs` jobs may be queued or running at once,
+# and finished jobs (with their result files) are forgotten after `ttl` seconds.
+class JobManager:
+    def __init__(self, max_workers=2, max_jobs=4, ttl=3600, result_dir=None):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.result_dir = result_dir or tempfile.gettempdir()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-job")
+        self._jobs = {}
+        self._sweeper = None
+        self._lock = threading.Lock()
+
+    # `work(job, result_file)` writes the job's output into the open binary file.
+    def submit(self, product, total, work):
+        with self._lock:
+            self._forget_expired()
+            active = sum(1 for job in self._jobs.values() if job.status in ("queued", "running"))
+            if active >= self.max_jobs:
+                raise JobLimitError(f"Too many batch jobs in progress (limit {self.max_jobs}).")
+            job = Job(product, total)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._forget_expired()
+            return self._jobs.get(job_id)
+
+    def sweep(self):
+        with self._lock:
+            self._forget_expired()
+
+    # Result files are also removed when nobody submits or polls jobs any more.
+    def start_sweeper(self, interval=300):
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_forever, args=(interval,), name="job-sweeper",
+                                             daemon=True)
+            self._sweeper.start()
+
+    def _sweep_forever(self, interval):
+        while True:
+            try:
+                self.sweep()
+            except OSError:
+                pass
+            time.sleep(interval)
+
+    def _run(self, job, work):
+        job.status = "running"
+        descriptor, path = tempfile.mkstemp(prefix=f"batch_{job.product}_", suffix=".zip", dir=self.result_dir)
+        try:
+            with os.fdopen(descriptor, "wb") as result_file:
+                work(job, result_file)
+        except Exception as error:
+            os.remove(path)
+            job.error = str(error)
+            job.status = "failed"
+        else:
+            job.result_path = path
+            job.status = "done"
+        job.finished_at = time.monotonic()
+
+    def _forget_expired(self):
+        now = time.monotonic()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and now - job.finished_at > self.ttl:
+                del self._jobs[job_id]
+                if job.result_path and os.path.exists(job.result_path):
+                    os.remove(job.result_path)
@@ -0,0 +1,67 @@
+import argparse
+import http.cookiejar
+import json
+import re
+import statistics
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+# Load test for POST /zelle against a running server: each client thread keeps its own session,
+# fetches a CSRF token once and then submits the form as fast as the server answers.
+
+ZELLE_FORM = {
+    'home_id': '88851234', 'fi_name': 'Load Test Bank', 'partner_id': '1234', 'rtn': '123456789', 'bug_id': '412345',
+    'csr_email': 'donotreply_banking@fiserv.com', 'reply_email': 'donotreply_banking@fiserv.com',
+    'csr_phone': '8005551234', 'home_page': 'https://www.example.com', 'ach': 'LOAD TEST', 'qa_org': 'QA1',
+    'cert_org': 'CE1', 'stage_org': 'ST1', 'prod_org': 'PR1', 'pod_number': '1',
+    'cert_domain': 'https://cwp411-cert.checkfreeweb.com', 'prod_domain': 'https://cwp411.checkfreeweb.com',
+    'danal': 'DANAL1', 'verid': 'CashEdge:Development', 'custom_domain': 'true', 'instant_connectivity': 'ESF',
+}
+
+
+def client(base_url, deadline, latencies, failures):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    page = opener.open(f"{base_url}/zelle").read().decode()
+    token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page).group(1)
+    body = urllib.parse.urlencode(dict(ZELLE_FORM, csrf_token=token)).encode()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            with opener.open(f"{base_url}/zelle", data=body) as response:
+                response.read()
+                ok = response.status == 200
+        except OSError:
+            ok = False
+        latencies.append(time.perf_counter() - started)
+        if not ok:
+            failures.append(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test POST /zelle against a running server.")
+    parser.add_argument("base_url", help="e.g. http://127.0.0.1:5000")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+
+    latencies, failures = [], []
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=client, args=(args.base_url, deadline, latencies, failures))
+               for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    print(json.dumps({
+        "clients": args.clients, "requests": len(latencies), "failures": len(failures),
+        "requests_per_second": round(len(latencies) / args.seconds, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }))
+
+
+if __name__ == "__main__":
+    main()
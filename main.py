@@ -1,336 +1,165 @@
+import hashlib
+import itertools
 import os
-
-from flask import Flask, render_template, redirect, url_for, request, flash, send_file
-from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, IntegerField
-from wtforms.fields.html5 import EmailField
-from wtforms.validators import DataRequired, ValidationError, Email, NumberRange, URL, Length, Regexp
-
-# placeholders used in scripts.
-HOME_ID = "&&home_id"
-FI_NAME = "&&fi_name"
-SPONSOR_ID = "&&sponsor_id"
-BUG_ID = "&&bug_id"
-RTN = "&&rtn"
-PARTNER_ID = "&&partner_id"
-CSR_EMAIL = "&&csr_email"
-REPLY_EMAIL = "&&reply_email"
-CSR_PHONE = "&&csr_phone"
-HOME_PAGE = "&&home_page"
-ACH = "&&ach"
-QA_ORG = "&&qa_org"
-CERT_ORG = "&&cert_org"
-STAGE_ORG = "&&stage_org"
-PROD_ORG = "&&prod_org"
-POD_NUMBER = "&&pod_number"
-CERT_DOMAIN = "&&cert_domain"
-PROD_DOMAIN = "&&prod_domain"
-DANAL = "&&danal"
-VERID = "&&verid"
-CUSTOM_DOMAIN = "&&custom_domain"
-CONNECTIVITY = "&&instant_connectivity"
+import re
+import sys
+import time
+
+from flask import Flask, render_template, redirect, url_for, request, flash, send_file, abort, Response, \
+    stream_with_context, jsonify, send_from_directory, g, make_response, session
+from jinja2 import FileSystemBytecodeCache
+
+from artifact_store import ArtifactStore
+from batch import RowError, consolidated_zip, normalize_row, read_rows, stream_zip
+from consolidate import ConsolidationError
+# Imported before the product registry so that FAST_STARTUP can defer the validator dependencies.
+import fast_startup
+from history import FILTERS, HistoryStore
+from http_cache import StaticAssets, gzip_response
+from jobs import JobManager, JobLimitError
+from metrics import metrics
+from products import PRODUCTS
+from script_store import ScriptStore
+from sql_template import result_cache
 
 cf_port = os.getenv("PORT")
-
-# Class Flask Form - RXP decommission.
-class RxpForm(FlaskForm):
-    home_id = IntegerField(label='HOME_ID', validators=[DataRequired(message='Home ID - This field is required.'),
-                                                        NumberRange(min=88830000, max=88839999,
-                                                                    message="Incorrect Home ID length/Series.")])
-    fi_name = StringField(label='FI NAME', validators=[DataRequired(message='FI NAME - This field is required.')])
-    bug_id = IntegerField(label='BUG ID', validators=[DataRequired(message='BUG ID - This field is required.'),
-                                                      NumberRange(min=200000, max=500000,
-                                                                  message='Incorrect Bug Number, currently we are '
-                                                                          'using bug number in 6 digit series.')])
-    sponsor_id = StringField(label='SPONSOR ID',
-                             validators=[DataRequired(message='SPONSOR ID - This field is required.')])
-
-
-# Class Flask Form - TN decommission.
-class TnForm(FlaskForm):
-    home_id = IntegerField(label='HOME_ID', validators=[DataRequired(message='Home ID - This field is required.'),
-                                                        NumberRange(min=88100000, max=88199999,
-                                                                    message="Incorrect Home ID length/Series.")])
-    fi_name = StringField(label='FI NAME', validators=[DataRequired(message='FI NAME - This field is required.')])
-    bug_id = IntegerField(label='BUG ID', validators=[DataRequired(message='BUG ID - This field is required.'),
-                                                      NumberRange(min=200000, max=500000,
-                                                                  message='Incorrect Bug Number, currently we are '
-                                                                          'using bug number in 6 digit series.')])
-
-
-# Class Flask Form - DI decommission.
-class DiForm(FlaskForm):
-    home_id = IntegerField(label='HOME_ID', validators=[DataRequired(message='Home ID - This field is required.'),
-                                                        NumberRange(min=88880000, max=88889999,
-                                                                    message="Incorrect Home ID length/Series.")])
-    fi_name = StringField(label='FI NAME', validators=[DataRequired(message='FI NAME - This field is required.')])
-    bug_id = IntegerField(label='BUG ID', validators=[DataRequired(message='BUG ID - This field is required.'),
-                                                      NumberRange(min=200000, max=500000,
-                                                                  message='Incorrect Bug Number, currently we are '
-                                                                          'using bug number in 6 digit series.')])
-    products = ['TN', 'POP', 'TN_POP']
-    product = SelectField(label='PRODUCT', choices=products,
-                          validators=[DataRequired()])
-
-
-# Class Flask Form - ROL decommission.
-class RolForm(FlaskForm):
-    home_id = IntegerField(label='HOME_ID', validators=[DataRequired(message='Home ID - This field is required.'),
-                                                        NumberRange(min=88840000, max=88849999,
-                                                                    message="Incorrect Home ID length/Series.")])
-    fi_name = StringField(label='FI NAME', validators=[DataRequired(message='FI NAME - This field is required.')])
-    bug_id = IntegerField(label='BUG ID', validators=[DataRequired(message='BUG ID - This field is required.'),
-                                                      NumberRange(min=200000, max=500000,
-                                                                  message='Incorrect Bug Number, currently we are '
-                                                                          'using bug number in 6 digit series.')])
-    rtn = StringField(label='Routing Number',
-                      validators=[DataRequired(message='Routing Number - This field is required.'),
-                                  Length(min=9, max=9, message="RTN should be at most 9 digits.")])
-
-
-# Class Flask Form - Zelle default setup.
-class ZelleForm(FlaskForm):
-    home_id = IntegerField(label='HOME_ID', validators=[DataRequired(message='Home ID - This field is required.'),
-                                                        NumberRange(min=88850000, max=88859999,
-                                                                    message="Incorrect Home ID length/Series.")])
-    fi_name = StringField(label='FI NAME', validators=[DataRequired(message='FI NAME - This field is required.')])
-    partner_id = StringField(label='PARTNER ID',
-                             validators=[DataRequired(message='PARTNER ID - This field is required.'),
-                                         Length(min=4, max=4, message="Partner ID should be at most 4 digits.")])
-    rtn = StringField(label='Routing Number',
-                      validators=[DataRequired(message='Routing Number - This field is required.'),
-                                  Length(min=9, max=9, message="RTN should be at most 9 digits.")])
-    bug_id = IntegerField(label='BUG ID', validators=[DataRequired(message='BUG ID - This field is required.'),
-                                                      NumberRange(min=200000, max=500000,
-                                                                  message='Incorrect Bug Number, currently we are '
-                                                                          'using bug number in 6 digit series.')])
-    csr_email = EmailField('CSR Email', default='donotreply_banking@fiserv.com',
-                           validators=[DataRequired(), Email()])
-    reply_email = EmailField('Reply Email', default='donotreply_banking@fiserv.com',
-                             validators=[DataRequired(), Email()])
-    csr_phone = StringField('CSR Phone', validators=[DataRequired(message='CSR Phone - This field is required.')])
-    home_page = StringField('Home Page URL',
-                            validators=[DataRequired(message='Home Page URL - This field is required.'),
-                                        URL(message='Please enter valid web URL')])
-    ach = StringField('ACH Descriptor', validators=[DataRequired(message='ACH Descriptor - This field is required.'),
-                                                    Length(min=1, max=16),
-                                                    Regexp('^\w+( +\w+)*$',
-                                                           message="ACH Descriptor - Special Characters are not allowed")])
-    qa_org = StringField('QA ORG ID',
-                         validators=[DataRequired(message='QA ORG ID - This field is required.'), Length(min=3, max=3)])
-    cert_org = StringField('INTQA/CERT ORG ID',
-                           validators=[DataRequired(message='INTQA/CERT ORG ID - This field is required.'),
-                                       Length(min=3, max=3)])
-    stage_org = StringField('STAGE ORG ID', validators=[DataRequired(message='STAGE ORG ID - This field is required.'),
-                                                        Length(min=3, max=3)])
-    prod_org = StringField('PRODUCTION ORG ID',
-                           validators=[DataRequired(message='PRODUCTION ORG ID - This field is required.'),
-                                       Length(min=3, max=3)])
-    pod = ['', 1, 2, 3, 4]
-    pod_number = SelectField(label='POD Number', choices=pod,
-                             validators=[DataRequired(message='POD Number - This field is required.')])
-    cert_domain = StringField('CERT Domain URL',
-                              validators=[DataRequired(message='CERT Domain URL - This field is required.'),
-                                          URL(message='Please enter valid web URL')])
-    prod_domain = StringField('PRODUCTION Domain URL',
-                              validators=[DataRequired(message='PRODUCTION Domain URL - This field is required.'),
-                                          URL(message='Please enter valid web URL')])
-    danal = StringField('DANAL ID',
-                        validators=[DataRequired(message='DANAL ID - This field is required.')])
-    verid = StringField('VERID ACCOUNT NAME',
-                        validators=[DataRequired(message='VERID ACCOUNT NAME - This field is required.')])
-    domain = ['', 'true', 'false']
-    custom_domain = SelectField(label='Custom Domain', choices=domain,
-                                validators=[DataRequired(message='Custom Domain - This field is required.')])
-    connectivity = ['', 'ESF', 'RTPService', 'DDAToPAN', 'DirectConnectPEPPlus', 'DirectConnectISO', 'FISProfile']
-    instant_connectivity = SelectField(label='INSTANT CONNECTIVITY', choices=connectivity,
-                                       validators=[
-                                           DataRequired(message='INSTANT CONNECTIVITY - This field is required.')])
-
-
-# Class Flask Form - RXP Zelle default setup.
-class RxpZelleForm(FlaskForm):
-    home_id = IntegerField(label='HOME_ID', validators=[DataRequired(message='Home ID - This field is required.'),
-                                                        NumberRange(min=88830000, max=88839999,
-                                                                    message="Incorrect Home ID length/Series.")])
-    fi_name = StringField(label='FI NAME', validators=[DataRequired(message='FI NAME - This field is required.')])
-    bug_id = IntegerField(label='BUG ID', validators=[DataRequired(message='BUG ID - This field is required.'),
-                                                      NumberRange(min=200000, max=500000,
-                                                                  message='Incorrect Bug Number, currently we are '
-                                                                          'using bug number in 6 digit series.')])
-    home_page = StringField('Home Page URL',
-                            validators=[DataRequired(message='Home Page URL - This field is required.'),
-                                        URL(message='Please enter valid web URL')])
-    qa_org = StringField('QA ORG ID',
-                         validators=[DataRequired(message='QA ORG ID - This field is required.'), Length(min=3, max=3)])
-    cert_org = StringField('INTQA/CERT ORG ID',
-                           validators=[DataRequired(message='INTQA/CERT ORG ID - This field is required.'),
-                                       Length(min=3, max=3)])
-    stage_org = StringField('STAGE ORG ID', validators=[DataRequired(message='STAGE ORG ID - This field is required.'),
-                                                        Length(min=3, max=3)])
-    prod_org = StringField('PRODUCTION ORG ID',
-                           validators=[DataRequired(message='PRODUCTION ORG ID - This field is required.'),
-                                       Length(min=3, max=3)])
-    pod = ['', 1, 2, 3, 4]
-    pod_number = SelectField(label='POD Number', choices=pod,
-                             validators=[DataRequired(message='POD Number - This field is required.')])
-    cert_domain = StringField('CERT Domain URL',
-                              validators=[DataRequired(message='CERT Domain URL - This field is required.'),
-                                          URL(message='Please enter valid web URL')])
-    prod_domain = StringField('PRODUCTION Domain URL',
-                              validators=[DataRequired(message='PRODUCTION Domain URL - This field is required.'),
-                                          URL(message='Please enter valid web URL')])
-    danal = StringField('DANAL ID',
-                        validators=[DataRequired(message='DANAL ID - This field is required.')])
-    domain = ['', 'true', 'false']
-    custom_domain = SelectField(label='Custom Domain', choices=domain,
-                                validators=[DataRequired(message='Custom Domain - This field is required.')])
-    connectivity = ['', 'ESF', 'RTPService', 'DDAToPAN', 'DirectConnectPEPPlus', 'DirectConnectISO', 'FISProfile']
-    instant_connectivity = SelectField(label='INSTANT CONNECTIVITY', choices=connectivity,
-                                       validators=[
-                                           DataRequired(message='INSTANT CONNECTIVITY - This field is required.')])
+# "production" serves through gunicorn (see gunicorn.conf.py), "development" through the Flask dev server.
+server_mode = os.getenv("SERVER_MODE", "development")
+# "disk" writes generated scripts into the working directory, "memory" keeps them in a bounded in-memory store.
+script_storage = os.getenv("SCRIPT_STORAGE", "disk")
+script_store = ScriptStore(ttl=int(os.getenv("SCRIPT_STORE_TTL", 900)),
+                           max_bytes=int(os.getenv("SCRIPT_STORE_MAX_BYTES", 8 * 1024 * 1024)))
+# "disk" mode scripts live in the artifact store; old ones are swept by age and by total size.
+artifact_store = ArtifactStore(os.getenv("ARTIFACT_DIR",
+                                         os.path.join(os.path.dirname(os.path.abspath(__file__)), "generated")),
+                               ttl=int(os.getenv("ARTIFACT_TTL", 24 * 3600)),
+                               max_bytes=int(os.getenv("ARTIFACT_MAX_BYTES", 16 * 1024 * 1024)))
+# Batch rows are validated this many at a time.
+batch_chunk_rows = int(os.getenv("BATCH_CHUNK_ROWS", 500))
+# Longest IN-list of a consolidated batch script (Oracle accepts at most 1000 expressions).
+consolidated_in_list_size = int(os.getenv("CONSOLIDATED_IN_LIST_SIZE", 1000))
+# Every generated script is recorded in a local SQLite history, searchable at /history. About 900 bytes per
+# entry: the newest HISTORY_MAX_ROWS entries, at most HISTORY_TTL seconds old, are kept.
+history = HistoryStore(os.getenv("HISTORY_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                            "history.sqlite3")),
+                       max_rows=int(os.getenv("HISTORY_MAX_ROWS", 10000)),
+                       ttl=int(os.getenv("HISTORY_TTL", 90 * 24 * 3600)))
+# Background batch jobs run on a small thread pool so a 64M instance stays within its memory limit.
+job_manager = JobManager(max_workers=int(os.getenv("BATCH_WORKERS", 2)), max_jobs=int(os.getenv("BATCH_MAX_JOBS", 4)))
+
+# Form classes and script generators built from the product registry.
+RxpForm, TnForm, DiForm, RolForm, ZelleForm, RxpZelleForm = (
+    PRODUCTS[name].form for name in ('rxp', 'tn', 'di', 'rol', 'zelle', 'rxp_zelle'))
+rxp_script, tn_script, di_script, rol_script, zelle_script, rxp_zelle_script = (
+    PRODUCTS[name].script for name in ('rxp', 'tn', 'di', 'rol', 'zelle', 'rxp_zelle'))
 
 
 app = Flask(__name__)
 app.secret_key = "any-string-you-want-just-keep-it-secret"
+# `python main.py precompile` compiles the page templates into this directory (run it before deploying); in
+# fast-startup mode they are loaded from there instead of being parsed. Entries are keyed by a checksum of the
+# template source, so an edited template is simply compiled again.
+jinja_cache_dir = os.getenv("JINJA_CACHE_DIR", os.path.join(app.root_path, "jinja_cache"))
+if fast_startup.enabled and os.path.isdir(jinja_cache_dir):
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(jinja_cache_dir)
+# Stylesheet and favicon under fingerprinted /assets URLs, cached by browsers for a year.
+static_assets = StaticAssets(app.static_folder)
+app.jinja_env.globals["asset_url"] = lambda path: url_for("asset", filename=static_assets.fingerprinted(path))
+# Pages only change with their templates, so their Last-Modified is the newest template's mtime.
+pages_modified = max(entry.stat().st_mtime for entry in os.scandir(os.path.join(app.root_path, app.template_folder)))
+# Script downloads and JSON responses are gzipped for clients that accept it.
+COMPRESSED_MIMETYPES = ("application/json", "application/sql")
+
+
+# The sweeper threads are started in the process that serves requests, not in a pre-fork master.
+@app.before_first_request
+def start_sweepers():
+    artifact_store.start_sweeper(interval=int(os.getenv("ARTIFACT_SWEEP_INTERVAL", 300)))
+    job_manager.start_sweeper(interval=int(os.getenv("ARTIFACT_SWEEP_INTERVAL", 300)))
+
+
+@app.before_request
+def start_request_timer():
+    metrics.set_route(request.endpoint or "unknown")
+    g.request_started = time.perf_counter()
+
+
+# Record total latency and the outcome (valid, invalid, tn_prefix_rejected, ok or error) of every request.
+@app.after_request
+def record_request(response):
+    route = metrics.route()
+    metrics.observe("total", time.perf_counter() - g.get("request_started", time.perf_counter()), route)
+    metrics.count_request(route, g.get("outcome") or ("ok" if response.status_code < 400 else "error"))
+    return response
+
+
+# Validate a submitted form, timing the validation stage.
+def validate_form(data_form):
+    if request.method != "POST":
+        return False
+    with metrics.stage("validate"):
+        valid = data_form.validate_on_submit()
+    g.outcome = "valid" if valid else "invalid"
+    return valid
+
+
+@app.after_request
+def compress_response(response):
+    if response.mimetype in COMPRESSED_MIMETYPES:
+        return gzip_response(response, request)
+    return response
+
+
+def render_page(template_name, **context):
+    with metrics.stage("page_render"):
+        return render_template(template_name, **context)
+
+
+# The signed CSRF token in a form changes on every render, so a GET page's ETag covers the page without it, plus the
+# session's token and the current half of the token's lifetime: a page revalidated from the browser cache never
+# carries a token close to expiry.
+_CSRF_VALUE = re.compile(rb'(name="csrf_token" type="hidden" value=")[^"]*')
+
+
+def conditional_page(page):
+    response = make_response(page)
+    window = (app.config.get("WTF_CSRF_TIME_LIMIT") or 3600) // 2
+    started = int(time.time()) // window * window
+    digest = hashlib.sha256(_CSRF_VALUE.sub(rb"\1", response.get_data()))
+    digest.update(f"{session.get('csrf_token', '')}:{started}".encode())
+    response.set_etag(digest.hexdigest()[:32])
+    response.last_modified = max(pages_modified, started)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 @app.route("/")
 def home():
-    return render_template("index.html")
-
-
-# RXP page
-@app.route("/RXP", methods=["GET", "POST"])
-def rxp_decommission():
-    data_form = RxpForm()
-    if request.method == "POST" and data_form.validate_on_submit():
-        home_id = request.form.get('home_id')
-        fi_name = request.form.get('fi_name')
-        sponsor_id = request.form.get('sponsor_id')
-        bug_id = request.form.get('bug_id')
-        download_file = rxp_script(home_id, fi_name, sponsor_id, bug_id)
-        return render_template('download.html', filename=download_file)
-    return render_template('RXP.html', form=data_form)
-
-
-# Script creation for RXP decommission
-def rxp_script(home_id, fi_name, sponsor_id, bug_id):
-    with open("sql_files/rxp.sql") as sql_file:
-        file_contents = sql_file.read()
-        new_file = file_contents.replace(HOME_ID, home_id).replace(FI_NAME, fi_name).replace(SPONSOR_ID,
-                                                                                             sponsor_id).replace(BUG_ID,
-                                                                                                                 bug_id)
-        script_file = f"update_decommission_rxp_{home_id}_bug{bug_id}.sql"
-        with open(script_file, mode="w") as completed_file:
-            completed_file.write(new_file)
-            return script_file
-
-
-# COASP, DNA and Architect page/form
-@app.route("/TN", methods=["GET", "POST"])
-def tn_decommission():
-    data_form = TnForm()
-    if request.method == "POST" and data_form.validate_on_submit():
-        home_id = request.form.get('home_id')
-        fi_name = request.form.get('fi_name')
-        bug_id = request.form.get('bug_id')
-        if not home_id.startswith(('8812', '8814', '8811')):
-            flash("Incorrect home id series.", "error")
-        else:
-            download_file = tn_script(home_id, fi_name, bug_id)
-            return render_template('download.html', filename=download_file)
-    return render_template('tn.html', form=data_form)
-
-
-# Script creation for COASP, DNA and Architect decommission
-def tn_script(home_id, fi_name, bug_id):
-    with open("sql_files/tn.sql") as sql_file:
-        file_contents = sql_file.read()
-        new_file = file_contents.replace(HOME_ID, home_id).replace(FI_NAME, fi_name).replace(BUG_ID, bug_id)
-        if home_id.startswith('8812'):
-            script_file = f"update_decommission_coasp_{home_id}_bug{bug_id}.sql"
-            with open(script_file, mode="w") as completed_file:
-                completed_file.write(new_file)
-                return script_file
-        elif home_id.startswith('8814'):
-            script_file = f"update_decommission_architect_{home_id}_bug{bug_id}.sql"
-            with open(script_file, mode="w") as completed_file:
-                completed_file.write(new_file)
-                return script_file
-        elif home_id.startswith('8811'):
-            script_file = f"update_decommission_dna_{home_id}_bug{bug_id}.sql"
-            with open(script_file, mode="w") as completed_file:
-                completed_file.write(new_file)
-                return script_file
-
-
-# DI Page/Form
-@app.route("/DI", methods=["GET", "POST"])
-def di_decommission():
-    data_form = DiForm()
-    if request.method == "POST" and data_form.validate_on_submit():
-        home_id = request.form.get('home_id')
-        fi_name = request.form.get('fi_name')
-        bug_id = request.form.get('bug_id')
-        product = request.form.get('product')
-        download_file = di_script(product, home_id, fi_name, bug_id)
-        return render_template('download.html', filename=download_file)
-    return render_template('DI.html', form=data_form)
-
-
-# Script creation for DI decommission
-def di_script(product, home_id, fi_name, bug_id):
-    if product == 'TN_POP':
-        with open("sql_files/di_tn_pop.sql") as sql_file:
-            file_contents = sql_file.read()
-            new_file = file_contents.replace(HOME_ID, home_id).replace(FI_NAME, fi_name).replace(BUG_ID, bug_id)
-            script_file = f"update_decommission_di_tn_pop_{home_id}_bug{bug_id}.sql"
-            with open(script_file, mode="w") as completed_file:
-                completed_file.write(new_file)
-                return script_file
-    elif product == 'TN':
-        with open("sql_files/di_tn.sql") as sql_file:
-            file_contents = sql_file.read()
-            new_file = file_contents.replace(HOME_ID, home_id).replace(FI_NAME, fi_name).replace(BUG_ID, bug_id)
-            script_file = f"update_decommission_di_tn_{home_id}_bug{bug_id}.sql"
-            with open(script_file, mode="w") as completed_file:
-                completed_file.write(new_file)
-                return script_file
-    elif product == 'POP':
-        with open("sql_files/di_pop.sql") as sql_file:
-            file_contents = sql_file.read()
-            new_file = file_contents.replace(HOME_ID, home_id).replace(FI_NAME, fi_name).replace(BUG_ID, bug_id)
-            script_file = f"update_decommission_di_pop_{home_id}_bug{bug_id}.sql"
-            with open(script_file, mode="w") as completed_file:
-                completed_file.write(new_file)
-                return script_file
-
-
-# ROL Page/Form
-@app.route("/ROL", methods=["GET", "POST"])
-def rol_decommission():
-    data_form = RolForm()
-    if request.method == "POST" and data_form.validate_on_submit():
-        home_id = request.form.get('home_id')
-        fi_name = request.form.get('fi_name')
-        bug_id = request.form.get('bug_id')
-        rtn = request.form.get('rtn')
-        download_file = rol_script(home_id, fi_name, rtn, bug_id)
-        return render_template('download.html', filename=download_file)
-    return render_template('rol.html', form=data_form)
-
-
-# Script creation for ROL decommission
-def rol_script(home_id, fi_name, rtn, bug_id):
-    with open("sql_files/rol.sql") as sql_file:
-        file_contents = sql_file.read()
-        new_file = file_contents.replace(HOME_ID, home_id).replace(FI_NAME, fi_name).replace(RTN, rtn).replace(BUG_ID,
-                                                                                                               bug_id)
-        script_file = f"update_decommission_ro_{home_id}_bug{bug_id}.sql"
-        with open(script_file, mode="w") as completed_file:
-            completed_file.write(new_file)
-            return script_file
+    return conditional_page(render_page("index.html"))
+
+
+# Product page/form - one view per registry entry, all running the same pipeline.
+def product_view(product):
+    def view():
+        data_form = product.form()
+        if validate_form(data_form):
+            values = {field: request.form.get(field) for field in product.fields}
+            script = product.stream(values)
+            if script is None:
+                _, message, g.outcome = product.rejection
+                flash(message, "error")
+            else:
+                download_file = save_script(*script)
+                record_history([(product.name, values) + script])
+                return render_page('download.html', filename=download_file)
+        page = render_page(product.page, form=data_form)
+        return conditional_page(page) if request.method == "GET" else page
+    return view
+
+
+for registered_product in PRODUCTS.values():
+    app.add_url_rule(registered_product.url, registered_product.endpoint, product_view(registered_product),
+                     methods=["GET", "POST"])
 
 
 ## Custom validator
@@ -340,87 +169,281 @@ def rol_script(home_id, fi_name, rtn, bug_id):
 #         raise ValidationError("Partner ID should be at most 4 digits")
 
 
-# Zelle Page/Form
-@app.route("/zelle", methods=["GET", "POST"])
-def zelle():
-    data_form = ZelleForm()
-    if request.method == "POST" and data_form.validate_on_submit():
-        download_file = zelle_script(request.form.get('home_id'), request.form.get('fi_name'),
-                                     request.form.get('partner_id'),
-                                     request.form.get('rtn'), request.form.get('bug_id'), request.form.get('csr_email'),
-                                     request.form.get('reply_email'), request.form.get('csr_phone'),
-                                     request.form.get('home_page'),
-                                     request.form.get('ach'), request.form.get('qa_org'), request.form.get('cert_org'),
-                                     request.form.get('stage_org'), request.form.get('prod_org'),
-                                     request.form.get('pod_number'),
-                                     request.form.get('cert_domain'), request.form.get('prod_domain'),
-                                     request.form.get('danal'),
-                                     request.form.get('verid'), request.form.get('custom_domain'),
-                                     request.form.get('instant_connectivity'))
-        return render_template('download.html', filename=download_file)
-    return render_template('direct_zelle.html', form=data_form)
-
-
-# Script creation for Zelle Default Setup
-def zelle_script(home_id, fi_name, partner_id, rtn, bug_id, csr_email, reply_email, csr_phone, home_page, ach, qa_org,
-                 cert_org, stage_org, prod_org, pod_number, cert_domain, prod_domain, danal, verid,
-                 custom_domain, instant_connectivity):
-    with open("sql_files/zelle_default.sql") as sql_file:
-        file_contents = sql_file.read()
-        new_file = file_contents.replace(HOME_ID, home_id).replace(FI_NAME, fi_name).replace(
-            PARTNER_ID, partner_id).replace(RTN, rtn).replace(BUG_ID, bug_id).replace(CSR_EMAIL, csr_email).replace(
-            REPLY_EMAIL, reply_email).replace(CSR_PHONE, csr_phone).replace(HOME_PAGE, home_page).replace(
-            ACH, ach).replace(QA_ORG, qa_org).replace(CERT_ORG, cert_org).replace(STAGE_ORG, stage_org).replace(
-            PROD_ORG, prod_org).replace(POD_NUMBER, pod_number).replace(CERT_DOMAIN, cert_domain).replace(
-            PROD_DOMAIN, prod_domain).replace(DANAL, danal).replace(VERID, verid).replace(
-            CUSTOM_DOMAIN, custom_domain).replace(CONNECTIVITY, instant_connectivity)
-        script_file = f"enable_zelle_default_setup_{home_id}_bug{bug_id}.sql"
-        with open(script_file, mode="w") as completed_file:
-            completed_file.write(new_file)
-            return script_file
-
-
-# RXP Zelle Page/Form
-@app.route("/rxp_zelle", methods=["GET", "POST"])
-def rxp_zelle():
-    data_form = RxpZelleForm()
-    if request.method == "POST" and data_form.validate_on_submit():
-        download_file = rxp_zelle_script(request.form.get('home_id'), request.form.get('fi_name'),
-                                         request.form.get('bug_id'), request.form.get('home_page'),
-                                         request.form.get('qa_org'), request.form.get('cert_org'),
-                                         request.form.get('stage_org'), request.form.get('prod_org'),
-                                         request.form.get('pod_number'),
-                                         request.form.get('cert_domain'), request.form.get('prod_domain'),
-                                         request.form.get('danal'),
-                                         request.form.get('custom_domain'), request.form.get('instant_connectivity'))
-        return render_template('download.html', filename=download_file)
-    return render_template('rxp_zelle.html', form=data_form)
-
-
-# Script creation for RXP Zelle Default Setup
-def rxp_zelle_script(home_id, fi_name, bug_id, home_page, qa_org, cert_org, stage_org,
-                     prod_org, pod_number, cert_domain, prod_domain, danal, custom_domain, instant_connectivity):
-    with open("sql_files/rxp_zelle.sql") as sql_file:
-        file_contents = sql_file.read()
-        new_file = file_contents.replace(HOME_ID, home_id).replace(FI_NAME, fi_name).replace(BUG_ID, bug_id).replace(
-            HOME_PAGE, home_page).replace(QA_ORG, qa_org).replace(CERT_ORG, cert_org).replace(
-            STAGE_ORG, stage_org).replace(PROD_ORG, prod_org).replace(POD_NUMBER, pod_number).replace(
-            CERT_DOMAIN, cert_domain).replace(PROD_DOMAIN, prod_domain).replace(DANAL, danal).replace(
-            CUSTOM_DOMAIN, custom_domain).replace(CONNECTIVITY, instant_connectivity)
-        script_file = f"enable_zelle_default_configurations_{home_id}_bug{bug_id}.sql"
-        with open(script_file, mode="w") as completed_file:
-            completed_file.write(new_file)
-            return script_file
+# Validate rows a chunk at a time with the product's bulk validator.
+# Yields ({field: value}, []) or (None, [(field, message), ...]) for every row, in order; unreadable CSV rows
+# (RowError) are reported under the field "row".
+def validate_rows(product, rows):
+    rows = iter(rows)
+    while True:
+        chunk = [row if isinstance(row, RowError) else normalize_row(row)
+                 for row in itertools.islice(rows, batch_chunk_rows)]
+        if not chunk:
+            return
+        with metrics.stage("validate"):
+            results = iter(product.bulk_validator.validate([row for row in chunk if not isinstance(row, RowError)]))
+        for row in chunk:
+            if isinstance(row, RowError):
+                yield None, [("row", row.message)]
+                continue
+            errors = next(results)
+            yield (None, errors) if errors else (product.bulk_validator.values(row), [])
+
+
+# Validate rows and generate their scripts.
+# Yields ((script_file, contents), []) or (None, [(field, message), ...]) for every row, in order; contents is a
+# StreamedScript that the caller consumes before asking for the next row.
+# Scripts the caller consumed in full are recorded in the history a chunk at a time; the ones it skipped (duplicates
+# in stream_zip) are neither recorded nor rendered.
+def generate_rows(product, rows):
+    product = PRODUCTS[product]
+    generated = []
+    try:
+        for values, errors in validate_rows(product, rows):
+            if values is None:
+                yield None, errors
+                continue
+            script = product.stream(values)
+            yield script, []
+            if not script[1].consumed:
+                continue
+            generated.append((product.name, values) + script)
+            if len(generated) >= batch_chunk_rows:
+                record_history(generated)
+                generated = []
+    finally:
+        record_history(generated)
+
+
+# Merge the valid rows of a batch into one set-based script.
+def consolidate_rows(product, values_list):
+    with metrics.stage("render"):
+        new_file = product.consolidate(values_list, consolidated_in_list_size)
+    metrics.add_generated_bytes(len(new_file))
+    record_history([(product.name, values, f"{product.name}_consolidated.sql", new_file) for values in values_list])
+    return new_file
+
+
+# Batch generation - CSV/JSON rows in, ZIP archive of scripts plus errors.csv out.
+# With ?output=consolidated the archive holds a single set-based script for all valid rows instead.
+@app.route("/batch/<product>", methods=["POST"])
+def batch(product):
+    if product not in PRODUCTS:
+        abort(404)
+    consolidated = request.args.get("output") == "consolidated"
+    if consolidated and not PRODUCTS[product].consolidated:
+        abort(400, f"Consolidated output is not available for {product}.")
+    if consolidated:
+        try:
+            PRODUCTS[product].check_consolidated()
+        except ConsolidationError as error:
+            abort(400, f"Consolidated output is not available for {product}: {error}")
+    try:
+        rows = read_rows(request.files.get('file'), None if 'file' in request.files else request.get_json(silent=True))
+    except ValueError as error:
+        abort(400, str(error))
+    if consolidated:
+        archive = consolidated_zip(validate_rows(PRODUCTS[product], rows), f"{product}_consolidated.sql",
+                                   lambda values_list: consolidate_rows(PRODUCTS[product], values_list))
+    else:
+        archive = stream_zip(generate_rows(product, rows))
+    response = Response(stream_with_context(archive), mimetype="application/zip")
+    response.headers.set("Content-Disposition", "attachment", filename=f"{product}_batch.zip")
+    return response
+
+
+# JSON API - one payload object or a list of them, scripts returned inline.
+@app.route("/api/v1/<product>", methods=["POST"])
+def api_generate(product):
+    if product not in PRODUCTS:
+        return jsonify(error=f"Unknown product '{product}'."), 404
+    payload = request.get_json(silent=True)
+    payloads = payload if isinstance(payload, list) else [payload]
+    if not payloads or not all(isinstance(item, dict) for item in payloads):
+        return jsonify(error="Request body must be a JSON object or a list of objects."), 400
+    results = []
+    for script, errors in generate_rows(product, payloads):
+        if script is None:
+            results.append({"errors": [{"field": field, "message": message} for field, message in errors]})
+        else:
+            results.append({"script_file": script[0], "script": "".join(script[1])})
+    status = 422 if any("errors" in result for result in results) else 200
+    if isinstance(payload, list):
+        return jsonify(results=results), status
+    return jsonify(results[0]), status
+
+
+# One script as a download, sent in chunks as it is rendered: the largest (multi-environment Zelle) scripts are
+# never held in memory whole. The body is a single JSON payload object, as for /api/v1/<product>.
+@app.route("/api/v1/<product>/script", methods=["POST"])
+def api_script(product):
+    if product not in PRODUCTS:
+        return jsonify(error=f"Unknown product '{product}'."), 404
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Request body must be a JSON object."), 400
+    [(values, errors)] = validate_rows(PRODUCTS[product], [payload])
+    if values is None:
+        return jsonify(errors=[{"field": field, "message": message} for field, message in errors]), 422
+    script_file, contents = PRODUCTS[product].stream(values)
+
+    def body():
+        for chunk in contents:
+            yield chunk.encode()
+        record_history([(product, values, script_file, contents)])
+
+    response = Response(stream_with_context(body()), mimetype="application/sql")
+    response.headers.set("Content-Disposition", "attachment", filename=script_file)
+    return response
+
+
+# Batch generation as a background job - returns a job ID to poll at /jobs/<job_id>.
+@app.route("/jobs/<product>", methods=["POST"])
+def submit_job(product):
+    if product not in PRODUCTS:
+        abort(404)
+    try:
+        rows = list(read_rows(request.files.get('file'),
+                              None if 'file' in request.files else request.get_json(silent=True)))
+    except ValueError as error:
+        abort(400, str(error))
+
+    def work(job, result_file):
+        with app.app_context():
+            for chunk in stream_zip(generate_rows(product, rows), on_row=job.record):
+                result_file.write(chunk)
+
+    try:
+        job = job_manager.submit(product, len(rows), work)
+    except JobLimitError as error:
+        return jsonify(error=str(error)), 429
+    return jsonify(id=job.id, status_url=url_for('job_status', job_id=job.id)), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        abort(404)
+    status = job.to_dict()
+    if job.status == "done":
+        status["download_url"] = url_for('job_download', job_id=job.id)
+    return jsonify(status)
+
+
+@app.route("/jobs/<job_id>/download", methods=["GET"])
+def job_download(job_id):
+    job = job_manager.get(job_id)
+    if job is None or job.status != "done":
+        abort(404)
+    return send_file(job.result_path, mimetype="application/zip", as_attachment=True,
+                     download_name=f"{job.product}_batch.zip")
+
+
+# Persist a generated script and return the name used by the download route. Streamed contents are written to
+# disk chunk by chunk; the in-memory store keeps whole scripts anyway. A script larger than the whole in-memory
+# store goes to the artifact store instead, where the download route finds it too.
+def save_script(script_file, new_file):
+    with metrics.stage("write"):
+        if script_storage == "memory":
+            contents = new_file if isinstance(new_file, str) else "".join(new_file)
+            try:
+                return script_store.put(script_file, contents)
+            except ValueError:
+                return artifact_store.write(script_file, contents)
+        return artifact_store.write(script_file, new_file)
+
+
+def record_history(entries):
+    with metrics.stage("history"):
+        history.record(entries)
+
+
+# Generation history - newest first, filtered by home_id, bug_id, product and fi_name (exact, any case) and a
+# since/until Unix time range. Pages hold `limit` entries; `next_url` continues below the last one.
+@app.route("/history", methods=["GET"])
+def generation_history():
+    try:
+        filters = {name: kind(request.args[name]) for name, kind in FILTERS.items() if name in request.args}
+        since, until = (float(request.args[name]) if name in request.args else None for name in ("since", "until"))
+        before = int(request.args["before"]) if "before" in request.args else None
+        limit = min(int(request.args.get("limit", 50)), 500)
+    except ValueError:
+        return jsonify(error="home_id, bug_id, since, until, before and limit must be numbers."), 400
+    entries, cursor = history.search(filters, since=since, until=until, before=before, limit=max(limit, 1))
+    next_url = None
+    if cursor is not None:
+        next_url = url_for('generation_history', **dict(request.args.items(), before=cursor))
+    return jsonify(entries=entries, next_url=next_url)
+
+
+# Result cache hit/miss counters
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+
+# Prometheus metrics
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    cache = result_cache.stats()
+    text = metrics.render(extra=[
+        ("pct_result_cache_hits_total", "counter", "Result cache hits.", cache["hits"]),
+        ("pct_result_cache_misses_total", "counter", "Result cache misses.", cache["misses"]),
+        ("pct_result_cache_bytes", "gauge", "Characters held in the result cache.", cache["bytes"]),
+    ])
+    return Response(text, mimetype="text/plain; version=0.0.4")
 
 
 # Download page common for all
 @app.route("/download/<download_filename>", methods=["GET", "POST"])
 def download(download_filename):
-    return send_file(download_filename, as_attachment=True)
+    if script_storage == "memory":
+        stored = script_store.get(download_filename)
+        if stored is not None:
+            script_file, data = stored
+            response = Response(data, mimetype="application/sql")
+            response.headers["Content-Length"] = str(len(data))
+            response.headers.set("Content-Disposition", "attachment", filename=script_file)
+            return response
+    # Flask 2.0 passes etag=None on to Werkzeug, which then sets no ETag at all.
+    return send_from_directory(artifact_store.root, download_filename, as_attachment=True, etag=True)
+
+
+@app.route("/assets/<path:filename>", methods=["GET"])
+def asset(filename):
+    return static_assets.response(filename, request)
+
+
+# Artifact store usage
+@app.route("/artifacts/metrics", methods=["GET"])
+def artifact_metrics():
+    return jsonify(artifact_store.metrics())
+
+
+# Compile the Jinja page templates and the SQL templates up front, before any worker is forked.
+def warm_up():
+    for template_name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(template_name)
+    for product in PRODUCTS.values():
+        product.compile_templates()
+
+
+def precompile_templates():
+    os.makedirs(jinja_cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(jinja_cache_dir)
+    app.jinja_env.bytecode_cache.clear()
+    for template_name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(template_name)
+    print(f"Compiled {len(app.jinja_env.list_templates())} templates into {jinja_cache_dir}")
 
 
 if __name__ == "__main__":
-    if cf_port is None:
+    if sys.argv[1:] == ["precompile"]:
+        precompile_templates()
+    # Deployments start gunicorn directly (manifest.yml, Procfile); going through here imports the app twice.
+    elif server_mode == "production":
+        os.execvp("gunicorn", ["gunicorn", "--config", os.path.join(app.root_path, "gunicorn.conf.py"), "main:app"])
+    elif cf_port is None:
         app.run(host='0.0.0.0', port=5000, debug=True)
     else:
-        app.run(host='0.0.0.0', port=int(cf_port), debug=True)
\ No newline at end of file
+        app.run(host='0.0.0.0', port=int(cf_port), debug=True)
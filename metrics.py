@@ -0,0 +1,102 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+# Upper bounds (seconds) of the latency histogram buckets.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{value}"' for name, value in labels.items())
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+
+
+# Per-route, per-stage latency histograms and request/byte counters, rendered in Prometheus text format.
+# The route label is whatever set_route() recorded for the current thread/context ("background" if nothing did);
+# a context variable is much cheaper to read on the hot path than Flask's request context.
+class Metrics:
+    def __init__(self):
+        self._route = ContextVar("metrics_route", default="background")
+        self._histograms = {}
+        self._requests = {}
+        self._generated_bytes = {}
+        self._lock = threading.Lock()
+
+    def set_route(self, route):
+        self._route.set(route)
+
+    def route(self):
+        return self._route.get()
+
+    def observe(self, stage, seconds, route=None):
+        key = (route or self.route(), stage)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def stage(self, stage):
+        return _Stage(self, stage)
+
+    def count_request(self, route, outcome):
+        with self._lock:
+            self._requests[route, outcome] = self._requests.get((route, outcome), 0) + 1
+
+    def add_generated_bytes(self, size, route=None):
+        route = route or self.route()
+        with self._lock:
+            self._generated_bytes[route] = self._generated_bytes.get(route, 0) + size
+
+    def render(self, extra=()):
+        with self._lock:
+            histograms = [(key, list(histogram.counts), histogram.total)
+                          for key, histogram in sorted(self._histograms.items())]
+            requests = sorted(self._requests.items())
+            generated_bytes = sorted(self._generated_bytes.items())
+        lines = ["# HELP pct_stage_duration_seconds Time spent in each request stage.",
+                 "# TYPE pct_stage_duration_seconds histogram"]
+        for (route, stage), counts, total in histograms:
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"pct_stage_duration_seconds_bucket{{{_labels(route=route, stage=stage, le=bound)}}} "
+                             f"{cumulative}")
+            lines.append(f"pct_stage_duration_seconds_sum{{{_labels(route=route, stage=stage)}}} {total}")
+            lines.append(f"pct_stage_duration_seconds_count{{{_labels(route=route, stage=stage)}}} {cumulative}")
+        lines += ["# HELP pct_requests_total Requests by route and outcome.", "# TYPE pct_requests_total counter"]
+        lines += [f"pct_requests_total{{{_labels(route=route, outcome=outcome)}}} {count}"
+                  for (route, outcome), count in requests]
+        lines += ["# HELP pct_generated_bytes_total Characters of SQL script generated.",
+                  "# TYPE pct_generated_bytes_total counter"]
+        lines += [f"pct_generated_bytes_total{{{_labels(route=route)}}} {size}" for route, size in generated_bytes]
+        for name, kind, help_text, value in extra:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,245 @@
+from flask_wtf import FlaskForm
+from wtforms import StringField, SelectField, IntegerField
+from wtforms.fields.html5 import EmailField
+from wtforms.validators import DataRequired, Email, NumberRange, URL, Length, Regexp
+
+from bulk_validate import BulkValidator
+from consolidate import consolidated_sql, consolidated_template
+from sql_template import HOME_ID, FI_NAME, SPONSOR_ID, BUG_ID, RTN, PARTNER_ID, CSR_EMAIL, REPLY_EMAIL, CSR_PHONE, \
+    HOME_PAGE, ACH, QA_ORG, CERT_ORG, STAGE_ORG, PROD_ORG, POD_NUMBER, CERT_DOMAIN, PROD_DOMAIN, DANAL, VERID, \
+    CUSTOM_DOMAIN, CONNECTIVITY, CHUNK_SIZE, render_sql, stream_sql, template_cache
+
+BUG_ID_MESSAGE = 'Incorrect Bug Number, currently we are using bug number in 6 digit series.'
+URL_MESSAGE = 'Please enter valid web URL'
+EMAIL_DEFAULT = 'donotreply_banking@fiserv.com'
+
+
+# Declarative description of one form field and its validators, in the order WTForms runs them.
+# `required` is the DataRequired message (True for the WTForms default), `number_range`/`length` are
+# (min, max, message) and `regexp` is (pattern, message); a None message keeps the WTForms default.
+class FieldSpec:
+    def __init__(self, kind, label, required=True, number_range=None, length=None, email=False, url=None,
+                 regexp=None, choices=None, default=None):
+        self.kind = kind
+        self.label = label
+        self.required = required
+        self.number_range = number_range
+        self.length = length
+        self.email = email
+        self.url = url
+        self.regexp = regexp
+        self.choices = choices
+        self.default = default
+
+    def build(self):
+        validators = [DataRequired() if self.required is True else DataRequired(message=self.required)]
+        if self.number_range:
+            minimum, maximum, message = self.number_range
+            validators.append(NumberRange(min=minimum, max=maximum, message=message))
+        if self.length:
+            minimum, maximum, message = self.length
+            validators.append(Length(min=minimum, max=maximum, message=message))
+        if self.email:
+            validators.append(Email())
+        if self.url:
+            validators.append(URL(message=self.url))
+        if self.regexp:
+            validators.append(Regexp(self.regexp[0], message=self.regexp[1]))
+        options = {'label': self.label, 'validators': validators}
+        if self.choices is not None:
+            options['choices'] = self.choices
+        if self.default is not None:
+            options['default'] = self.default
+        return self.kind(**options)
+
+
+# Fields shared by the product forms. home_id is added per product from its home-ID series.
+FIELDS = {
+    'fi_name': FieldSpec(StringField, 'FI NAME', required='FI NAME - This field is required.'),
+    'bug_id': FieldSpec(IntegerField, 'BUG ID', required='BUG ID - This field is required.',
+                        number_range=(200000, 500000, BUG_ID_MESSAGE)),
+    'sponsor_id': FieldSpec(StringField, 'SPONSOR ID', required='SPONSOR ID - This field is required.'),
+    'product': FieldSpec(SelectField, 'PRODUCT', choices=['TN', 'POP', 'TN_POP']),
+    'rtn': FieldSpec(StringField, 'Routing Number', required='Routing Number - This field is required.',
+                     length=(9, 9, "RTN should be at most 9 digits.")),
+    'partner_id': FieldSpec(StringField, 'PARTNER ID', required='PARTNER ID - This field is required.',
+                            length=(4, 4, "Partner ID should be at most 4 digits.")),
+    'csr_email': FieldSpec(EmailField, 'CSR Email', email=True, default=EMAIL_DEFAULT),
+    'reply_email': FieldSpec(EmailField, 'Reply Email', email=True, default=EMAIL_DEFAULT),
+    'csr_phone': FieldSpec(StringField, 'CSR Phone', required='CSR Phone - This field is required.'),
+    'home_page': FieldSpec(StringField, 'Home Page URL', required='Home Page URL - This field is required.',
+                           url=URL_MESSAGE),
+    'ach': FieldSpec(StringField, 'ACH Descriptor', required='ACH Descriptor - This field is required.',
+                     length=(1, 16, None),
+                     regexp=(r'^\w+( +\w+)*$', "ACH Descriptor - Special Characters are not allowed")),
+    'qa_org': FieldSpec(StringField, 'QA ORG ID', required='QA ORG ID - This field is required.',
+                        length=(3, 3, None)),
+    'cert_org': FieldSpec(StringField, 'INTQA/CERT ORG ID', required='INTQA/CERT ORG ID - This field is required.',
+                          length=(3, 3, None)),
+    'stage_org': FieldSpec(StringField, 'STAGE ORG ID', required='STAGE ORG ID - This field is required.',
+                           length=(3, 3, None)),
+    'prod_org': FieldSpec(StringField, 'PRODUCTION ORG ID', required='PRODUCTION ORG ID - This field is required.',
+                          length=(3, 3, None)),
+    'pod_number': FieldSpec(SelectField, 'POD Number', required='POD Number - This field is required.',
+                            choices=['', 1, 2, 3, 4]),
+    'cert_domain': FieldSpec(StringField, 'CERT Domain URL', required='CERT Domain URL - This field is required.',
+                             url=URL_MESSAGE),
+    'prod_domain': FieldSpec(StringField, 'PRODUCTION Domain URL',
+                             required='PRODUCTION Domain URL - This field is required.', url=URL_MESSAGE),
+    'danal': FieldSpec(StringField, 'DANAL ID', required='DANAL ID - This field is required.'),
+    'verid': FieldSpec(StringField, 'VERID ACCOUNT NAME', required='VERID ACCOUNT NAME - This field is required.'),
+    'custom_domain': FieldSpec(SelectField, 'Custom Domain', required='Custom Domain - This field is required.',
+                               choices=['', 'true', 'false']),
+    'instant_connectivity': FieldSpec(SelectField, 'INSTANT CONNECTIVITY',
+                                      required='INSTANT CONNECTIVITY - This field is required.',
+                                      choices=['', 'ESF', 'RTPService', 'DDAToPAN', 'DirectConnectPEPPlus',
+                                               'DirectConnectISO', 'FISProfile']),
+}
+
+
+def home_id_field(series):
+    return FieldSpec(IntegerField, 'HOME_ID', required='Home ID - This field is required.',
+                     number_range=(series[0], series[1], "Incorrect Home ID length/Series."))
+
+
+# One product: its page, form fields, SQL template(s), placeholder mapping and output filename pattern.
+# Products with several templates pick one through `variant`, which maps the submitted values to a key of
+# `templates`; values without a template are rejected with `rejection` = (field, message, metrics outcome).
+# `consolidated` products can also merge a batch into one set-based script.
+class Product:
+    def __init__(self, name, form_name, endpoint, url, page, home_id_series, fields, placeholders, templates,
+                 script_args, variant=None, rejection=None, consolidated=False):
+        self.name = name
+        self.endpoint = endpoint
+        self.url = url
+        self.page = page
+        self.home_id_series = home_id_series
+        self.field_specs = dict(home_id=home_id_field(home_id_series), **{field: FIELDS[field] for field in fields})
+        self.fields = tuple(self.field_specs)
+        self.placeholders = placeholders
+        self.templates = templates
+        self.script_args = script_args
+        self.variant = variant or (lambda values: None)
+        self.rejection = rejection
+        self.consolidated = consolidated
+        # Fields are created in declaration order, which is the order WTForms validates and reports them in.
+        self.form = type(form_name, (FlaskForm,), {field: spec.build() for field, spec in self.field_specs.items()})
+        # Same rules without form objects, for batches.
+        self.bulk_validator = BulkValidator(self)
+
+    # Render the product's script for a {field: value} mapping: (script_file, contents), or None when no
+    # template applies to the values.
+    def generate(self, values):
+        template = self.templates.get(self.variant(values))
+        if template is None:
+            return None
+        sql_path, filename = template
+        return filename.format(**values), render_sql(sql_path, self.placeholder_values(values))
+
+    # Same as generate(), but the contents are a StreamedScript rendered `chunk_size` characters at a time while
+    # it is iterated, for scripts written straight into a response, a file or a ZIP member.
+    def stream(self, values, chunk_size=CHUNK_SIZE):
+        template = self.templates.get(self.variant(values))
+        if template is None:
+            return None
+        sql_path, filename = template
+        return filename.format(**values), stream_sql(sql_path, self.placeholder_values(values), chunk_size)
+
+    # One script for many {field: value} mappings, each valid for generate(): rows sharing a template are
+    # merged into set-based statements (see consolidate.py).
+    def consolidate(self, values_list, in_list_size=1000):
+        groups = {}
+        for values in values_list:
+            sql_path, _ = self.templates[self.variant(values)]
+            groups.setdefault(sql_path, []).append(self.placeholder_values(values))
+        return consolidated_sql(list(groups.items()), in_list_size)
+
+    # Raises ConsolidationError when one of the product's templates cannot be merged into a single-transaction
+    # script; missing template files are left for generation to report.
+    def check_consolidated(self):
+        for sql_path, _ in self.templates.values():
+            try:
+                consolidated_template(sql_path)
+            except FileNotFoundError:
+                continue
+
+    def placeholder_values(self, values):
+        return {placeholder: values[field] for placeholder, field in self.placeholders.items()}
+
+    # Positional form of generate(), in the argument order of the original *_script functions.
+    def script(self, *args):
+        return self.generate(dict(zip(self.script_args, args)))
+
+    def compile_templates(self):
+        for sql_path, _ in self.templates.values():
+            try:
+                template_cache.get(sql_path)
+            except FileNotFoundError:
+                continue
+
+
+DECOMMISSION_PLACEHOLDERS = {HOME_ID: 'home_id', FI_NAME: 'fi_name', BUG_ID: 'bug_id'}
+
+PRODUCTS = {product.name: product for product in [
+    Product('rxp', 'RxpForm', 'rxp_decommission', '/RXP', 'RXP.html', (88830000, 88839999),
+            fields=('fi_name', 'bug_id', 'sponsor_id'),
+            placeholders=dict(DECOMMISSION_PLACEHOLDERS, **{SPONSOR_ID: 'sponsor_id'}),
+            templates={None: ("sql_files/rxp.sql", "update_decommission_rxp_{home_id}_bug{bug_id}.sql")},
+            script_args=('home_id', 'fi_name', 'sponsor_id', 'bug_id'),
+            consolidated=True),
+    # COASP, Architect and DNA share a template; the home ID prefix picks the output name.
+    Product('tn', 'TnForm', 'tn_decommission', '/TN', 'tn.html', (88100000, 88199999),
+            fields=('fi_name', 'bug_id'),
+            placeholders=DECOMMISSION_PLACEHOLDERS,
+            templates={'8812': ("sql_files/tn.sql", "update_decommission_coasp_{home_id}_bug{bug_id}.sql"),
+                       '8814': ("sql_files/tn.sql", "update_decommission_architect_{home_id}_bug{bug_id}.sql"),
+                       '8811': ("sql_files/tn.sql", "update_decommission_dna_{home_id}_bug{bug_id}.sql")},
+            script_args=('home_id', 'fi_name', 'bug_id'),
+            variant=lambda values: values['home_id'][:4],
+            rejection=('home_id', "Incorrect home id series.", "tn_prefix_rejected"),
+            consolidated=True),
+    Product('di', 'DiForm', 'di_decommission', '/DI', 'DI.html', (88880000, 88889999),
+            fields=('fi_name', 'bug_id', 'product'),
+            placeholders=DECOMMISSION_PLACEHOLDERS,
+            templates={'TN': ("sql_files/di_tn.sql", "update_decommission_di_tn_{home_id}_bug{bug_id}.sql"),
+                       'POP': ("sql_files/di_pop.sql", "update_decommission_di_pop_{home_id}_bug{bug_id}.sql"),
+                       'TN_POP': ("sql_files/di_tn_pop.sql",
+                                  "update_decommission_di_tn_pop_{home_id}_bug{bug_id}.sql")},
+            script_args=('product', 'home_id', 'fi_name', 'bug_id'),
+            variant=lambda values: values['product'],
+            consolidated=True),
+    Product('rol', 'RolForm', 'rol_decommission', '/ROL', 'rol.html', (88840000, 88849999),
+            fields=('fi_name', 'bug_id', 'rtn'),
+            placeholders=dict(DECOMMISSION_PLACEHOLDERS, **{RTN: 'rtn'}),
+            templates={None: ("sql_files/rol.sql", "update_decommission_ro_{home_id}_bug{bug_id}.sql")},
+            script_args=('home_id', 'fi_name', 'rtn', 'bug_id'),
+            consolidated=True),
+    Product('zelle', 'ZelleForm', 'zelle', '/zelle', 'direct_zelle.html', (88850000, 88859999),
+            fields=('fi_name', 'partner_id', 'rtn', 'bug_id', 'csr_email', 'reply_email', 'csr_phone', 'home_page',
+                    'ach', 'qa_org', 'cert_org', 'stage_org', 'prod_org', 'pod_number', 'cert_domain', 'prod_domain',
+                    'danal', 'verid', 'custom_domain', 'instant_connectivity'),
+            placeholders={HOME_ID: 'home_id', FI_NAME: 'fi_name', PARTNER_ID: 'partner_id', RTN: 'rtn',
+                          BUG_ID: 'bug_id', CSR_EMAIL: 'csr_email', REPLY_EMAIL: 'reply_email',
+                          CSR_PHONE: 'csr_phone', HOME_PAGE: 'home_page', ACH: 'ach', QA_ORG: 'qa_org',
+                          CERT_ORG: 'cert_org', STAGE_ORG: 'stage_org', PROD_ORG: 'prod_org',
+                          POD_NUMBER: 'pod_number', CERT_DOMAIN: 'cert_domain', PROD_DOMAIN: 'prod_domain',
+                          DANAL: 'danal', VERID: 'verid', CUSTOM_DOMAIN: 'custom_domain',
+                          CONNECTIVITY: 'instant_connectivity'},
+            templates={None: ("sql_files/zelle_default.sql", "enable_zelle_default_setup_{home_id}_bug{bug_id}.sql")},
+            script_args=('home_id', 'fi_name', 'partner_id', 'rtn', 'bug_id', 'csr_email', 'reply_email',
+                         'csr_phone', 'home_page', 'ach', 'qa_org', 'cert_org', 'stage_org', 'prod_org',
+                         'pod_number', 'cert_domain', 'prod_domain', 'danal', 'verid', 'custom_domain',
+                         'instant_connectivity')),
+    Product('rxp_zelle', 'RxpZelleForm', 'rxp_zelle', '/rxp_zelle', 'rxp_zelle.html', (88830000, 88839999),
+            fields=('fi_name', 'bug_id', 'home_page', 'qa_org', 'cert_org', 'stage_org', 'prod_org', 'pod_number',
+                    'cert_domain', 'prod_domain', 'danal', 'custom_domain', 'instant_connectivity'),
+            placeholders={HOME_ID: 'home_id', FI_NAME: 'fi_name', BUG_ID: 'bug_id', HOME_PAGE: 'home_page',
+                          QA_ORG: 'qa_org', CERT_ORG: 'cert_org', STAGE_ORG: 'stage_org', PROD_ORG: 'prod_org',
+                          POD_NUMBER: 'pod_number', CERT_DOMAIN: 'cert_domain', PROD_DOMAIN: 'prod_domain',
+                          DANAL: 'danal', CUSTOM_DOMAIN: 'custom_domain', CONNECTIVITY: 'instant_connectivity'},
+            templates={None: ("sql_files/rxp_zelle.sql",
+                              "enable_zelle_default_configurations_{home_id}_bug{bug_id}.sql")},
+            script_args=('home_id', 'fi_name', 'bug_id', 'home_page', 'qa_org', 'cert_org', 'stage_org',
+                         'prod_org', 'pod_number', 'cert_domain', 'prod_domain', 'danal', 'custom_domain',
+                         'instant_connectivity')),
+]}
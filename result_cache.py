@@ -0,0 +1,97 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+# A render that is in progress; identical concurrent requests wait on it instead of rendering again.
+class _Flight:
+    def __init__(self):
+        self.finished = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# LRU cache of rendered scripts keyed by (template identity, template version, parameters),
+# bounded by entry count and total characters, with single-flight rendering for identical keys.
+class ResultCache:
+    def __init__(self, max_entries=256, max_bytes=4 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(template, version, values):
+        normalized = json.dumps([template, version, sorted((str(name), str(value)) for name, value in values.items())])
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    # Cached result for `key`, or None. Nothing is rendered or stored on a miss.
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if not leader:
+            flight.finished.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = render()
+        except Exception as error:
+            flight.error = error
+            raise
+        else:
+            self._store(key, flight.result)
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.finished.set()
+        return flight.result
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self.total_bytes,
+                    "max_entries": self.max_entries, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _store(self, key, result):
+        if len(result) > self.max_bytes:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self.total_bytes += len(result)
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+                self.evictions += 1
@@ -0,0 +1,51 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+# Bounded in-memory store for rendered scripts, keyed by an opaque download token.
+# Entries expire after `ttl` seconds, and the oldest ones are dropped once `max_bytes` would be exceeded.
+class ScriptStore:
+    def __init__(self, ttl=900, max_bytes=8 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, script_file, contents):
+        data = contents.encode() if isinstance(contents, str) else contents
+        if len(data) > self.max_bytes:
+            raise ValueError(f"{script_file} is larger than the script store limit of {self.max_bytes} bytes.")
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._expire(time.monotonic())
+            while self._entries and self.total_bytes + len(data) > self.max_bytes:
+                self._pop_oldest()
+            self._entries[token] = (time.monotonic() + self.ttl, script_file, data)
+            self.total_bytes += len(data)
+        return token
+
+    def get(self, token):
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._entries.get(token)
+        if entry is None:
+            return None
+        return entry[1], entry[2]
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Entries are inserted with a constant TTL, so the oldest entry always expires first.
+    def _expire(self, now):
+        while self._entries:
+            expires = next(iter(self._entries.values()))[0]
+            if expires > now:
+                break
+            self._pop_oldest()
+
+    def _pop_oldest(self):
+        _, (_, _, data) = self._entries.popitem(last=False)
+        self.total_bytes -= len(data)
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import re
+import threading
+import time
+
+from metrics import metrics
+from result_cache import ResultCache
+
+# placeholders used in scripts.
+HOME_ID = "&&home_id"
+FI_NAME = "&&fi_name"
+SPONSOR_ID = "&&sponsor_id"
+BUG_ID = "&&bug_id"
+RTN = "&&rtn"
+PARTNER_ID = "&&partner_id"
+CSR_EMAIL = "&&csr_email"
+REPLY_EMAIL = "&&reply_email"
+CSR_PHONE = "&&csr_phone"
+HOME_PAGE = "&&home_page"
+ACH = "&&ach"
+QA_ORG = "&&qa_org"
+CERT_ORG = "&&cert_org"
+STAGE_ORG = "&&stage_org"
+PROD_ORG = "&&prod_org"
+POD_NUMBER = "&&pod_number"
+CERT_DOMAIN = "&&cert_domain"
+PROD_DOMAIN = "&&prod_domain"
+DANAL = "&&danal"
+VERID = "&&verid"
+CUSTOM_DOMAIN = "&&custom_domain"
+CONNECTIVITY = "&&instant_connectivity"
+
+PLACEHOLDERS = (HOME_ID, FI_NAME, SPONSOR_ID, BUG_ID, RTN, PARTNER_ID, CSR_EMAIL, REPLY_EMAIL, CSR_PHONE, HOME_PAGE, ACH,
+                QA_ORG, CERT_ORG, STAGE_ORG, PROD_ORG, POD_NUMBER, CERT_DOMAIN, PROD_DOMAIN, DANAL, VERID, CUSTOM_DOMAIN,
+                CONNECTIVITY)
+
+
+# Compiled form of a sql_files/*.sql template: literal segments with placeholder slots in between.
+class SqlTemplate:
+    def __init__(self, text, placeholders=PLACEHOLDERS, version=None):
+        self.version = version
+        # Longest placeholder first, so a placeholder that prefixes another one never wins the match.
+        pattern = re.compile("|".join(re.escape(name) for name in sorted(set(placeholders), key=len, reverse=True)))
+        parts = []
+        slots = []
+        position = 0
+        for match in pattern.finditer(text) if placeholders else ():
+            parts.append(text[position:match.start()])
+            slots.append((len(parts), match.group()))
+            parts.append(None)
+            position = match.end()
+        parts.append(text[position:])
+        self._parts = parts
+        self._slots = slots
+        self.literal_size = sum(len(part) for part in parts if part is not None)
+
+    # Placeholders missing from `values` are left in the output as-is. Values are inserted verbatim: placeholder text
+    # inside a value (fi_name "A &&bug_id") is not substituted again, unlike the str.replace chains this replaced.
+    def render(self, values):
+        parts = self._parts[:]
+        for index, name in self._slots:
+            parts[index] = values.get(name, name)
+        return "".join(parts)
+
+    # render() in pieces of about `chunk_size` characters, so the whole output is never held at once.
+    def iter_render(self, values, chunk_size):
+        slots = iter(self._slots)
+        buffer = []
+        buffered = 0
+        for part in self._parts:
+            if part is None:
+                _, name = next(slots)
+                part = values.get(name, name)
+            if buffered + len(part) < chunk_size:
+                buffer.append(part)
+                buffered += len(part)
+                continue
+            start = chunk_size - buffered
+            buffer.append(part[:start])
+            yield "".join(buffer)
+            while len(part) - start >= chunk_size:
+                yield part[start:start + chunk_size]
+                start += chunk_size
+            buffer = [part[start:]]
+            buffered = len(part) - start
+        if buffered:
+            yield "".join(buffer)
+
+
+# Loads each template once and recompiles it only when the file's mtime changes.
+# `compile` builds the cached object from the file text; SqlTemplate unless given.
+class TemplateCache:
+    def __init__(self, compile=SqlTemplate):
+        self.compile = compile
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        template = self._templates.get(path)
+        if template is not None and template.version == mtime:
+            return template
+        with self._lock:
+            template = self._templates.get(path)
+            if template is None or template.version != mtime:
+                with open(path) as sql_file:
+                    template = self.compile(sql_file.read(), version=mtime)
+                self._templates[path] = template
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+
+template_cache = TemplateCache()
+# Characters per piece when a script is streamed instead of rendered whole.
+CHUNK_SIZE = int(os.getenv("RENDER_CHUNK_SIZE", 64 * 1024))
+result_cache = ResultCache(max_entries=int(os.getenv("RESULT_CACHE_ENTRIES", 256)),
+                           max_bytes=int(os.getenv("RESULT_CACHE_BYTES", 4 * 1024 * 1024)))
+
+
+# Render a template file with a {placeholder: value} mapping in a single pass.
+# Repeated renders of the same template version with the same values are served from the result cache.
+def render_sql(path, values):
+    with metrics.stage("template_io"):
+        template = template_cache.get(path)
+    with metrics.stage("render"):
+        key = result_cache.key(path, template.version, values)
+        new_file = result_cache.get_or_render(key, lambda: template.render(values))
+    metrics.add_generated_bytes(len(new_file))
+    return new_file
+
+
+# A script rendered on demand: iterate it once to stream its chunks. Its size and SHA-256 are known once it has
+# been `consumed`; asking for the hash first renders (and drops) whatever has not been read.
+class StreamedScript:
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._digest = hashlib.sha256()
+        self.size = 0
+        self.consumed = False
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            self._digest.update(chunk.encode())
+            self.size += len(chunk)
+            yield chunk
+        self.consumed = True
+
+    def sha256(self):
+        for _ in self:
+            pass
+        return self._digest.hexdigest()
+
+
+# Chunked form of render_sql(). A cached result is sliced, and scripts that fit in one chunk go through the result
+# cache as usual; anything larger is rendered piece by piece and not cached, so memory stays bounded by the chunk size.
+def stream_sql(path, values, chunk_size=CHUNK_SIZE):
+    with metrics.stage("template_io"):
+        template = template_cache.get(path)
+    if template.literal_size <= chunk_size:
+        return StreamedScript(iter([render_sql(path, values)]))
+    cached = result_cache.get(result_cache.key(path, template.version, values))
+    if cached is not None:
+        return StreamedScript(cached[start:start + chunk_size] for start in range(0, len(cached), chunk_size))
+    return StreamedScript(_timed_chunks(template.iter_render(values, chunk_size), metrics.route()))
+
+
+# Chunks are rendered whenever the consumer asks for them, possibly after the request has returned, so the
+# render time and size are added up and reported against the route that started the stream.
+def _timed_chunks(chunks, route):
+    elapsed = 0.0
+    size = 0
+    while True:
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        elapsed += time.perf_counter() - started
+        if chunk is None:
+            break
+        size += len(chunk)
+        yield chunk
+    metrics.observe("render", elapsed, route)
+    metrics.add_generated_bytes(size, route)
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark import APP_DIR, FORMS, write_templates
+
+# Cold-start benchmark: starts the app in fresh interpreters, in the default and the FAST_STARTUP mode, and
+# measures import time, time to the first page and the first generated script, and resident memory.
+# The fast-startup figures are checked against budgets; the run exits with status 1 when one is exceeded.
+
+# Runs in each fresh interpreter; prints one JSON line of timings (ms) and memory (kB).
+CHILD = """
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, os.environ["APP_DIR"])
+import main
+imported = time.perf_counter()
+
+
+def memory(field):
+    with open("/proc/self/status") as status:
+        return int(next(line.split()[1] for line in status if line.startswith(field + ":")))
+
+
+import_rss = memory("VmRSS")
+main.app.config["WTF_CSRF_ENABLED"] = False
+client = main.app.test_client()
+client.get("/zelle").close()
+first_page = time.perf_counter()
+assert client.post("/zelle", data=json.loads(os.environ["FORM"])).status_code == 200
+first_script = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_page_ms": (first_page - started) * 1000,
+                  "first_script_ms": (first_script - started) * 1000, "import_rss_kb": import_rss,
+                  "peak_rss_kb": memory("VmHWM")}))
+"""
+
+METRICS = ("process_ms", "import_ms", "first_page_ms", "first_script_ms", "import_rss_kb", "peak_rss_kb")
+
+
+def start(work_dir, fast):
+    env = dict(os.environ, APP_DIR=APP_DIR, FORM=json.dumps(FORMS["zelle"]), FAST_STARTUP="1" if fast else "0",
+               JINJA_CACHE_DIR=os.path.join(work_dir, "jinja_cache"), ARTIFACT_DIR=os.path.join(work_dir, "generated"),
+               HISTORY_DB=os.path.join(work_dir, "history.sqlite3"))
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD], cwd=work_dir, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start in the default and fast-startup modes.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per mode; medians are reported")
+    parser.add_argument("--import-budget-ms", type=float, default=400)
+    parser.add_argument("--first-script-budget-ms", type=float, default=550)
+    parser.add_argument("--rss-budget-mb", type=float, default=45)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="pct_startup_")
+    try:
+        write_templates(os.path.join(work_dir, "sql_files"))
+        # The deployment step that fast-startup mode relies on.
+        subprocess.run([sys.executable, os.path.join(APP_DIR, "main.py"), "precompile"], cwd=work_dir, check=True,
+                       env=dict(os.environ, JINJA_CACHE_DIR=os.path.join(work_dir, "jinja_cache"),
+                                ARTIFACT_DIR=os.path.join(work_dir, "generated")), capture_output=True)
+        # One unmeasured start so both modes see warm OS file caches and compiled .pyc files.
+        start(work_dir, fast=False)
+        results = {}
+        for name, fast in (("default", False), ("fast", True)):
+            runs = [start(work_dir, fast) for _ in range(args.runs)]
+            results[name] = {metric: statistics.median(run[metric] for run in runs) for metric in METRICS}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'metric':18} {'default':>10} {'fast':>10}")
+    for metric in METRICS:
+        print(f"{metric:18} {results['default'][metric]:>10.1f} {results['fast'][metric]:>10.1f}")
+    fast = results["fast"]
+    budgets = [("import_ms", fast["import_ms"], args.import_budget_ms),
+               ("first_script_ms", fast["first_script_ms"], args.first_script_budget_ms),
+               ("peak_rss_mb", fast["peak_rss_kb"] / 1024, args.rss_budget_mb)]
+    over = [(name, value, budget) for name, value, budget in budgets if value > budget]
+    for name, value, budget in over:
+        print(f"BUDGET EXCEEDED: fast-startup {name} {value:.1f} > {budget:.1f}")
+    if over:
+        sys.exit(1)
+    print("Fast-startup mode is within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import random
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import main
+from products import PRODUCTS
+
+VALID = {
+    "fi_name": "Bank", "bug_id": "412345", "sponsor_id": "SP01", "product": "TN", "rtn": "123456789",
+    "partner_id": "1234", "csr_email": "csr@example.com", "reply_email": "reply@example.com", "csr_phone": "555",
+    "home_page": "https://www.example.com", "ach": "FIRST BANK", "qa_org": "QA1", "cert_org": "CE1",
+    "stage_org": "ST1", "prod_org": "PR1", "pod_number": "2", "cert_domain": "https://cert.example.com",
+    "prod_domain": "https://prod.example.com", "danal": "DANAL1", "verid": "CashEdge:Development",
+    "custom_domain": "true", "instant_connectivity": "ESF",
+}
+HOME_IDS = {"rxp": "88831234", "tn": "88121234", "di": "88881234", "rol": "88841234", "zelle": "88851234",
+            "rxp_zelle": "88839876"}
+
+# Values tried in every field: blanks, whitespace, non-integers, range edges, TN prefixes outside
+# 8811/8812/8814, lengths around the limits, bad emails and URLs, ACH punctuation and unknown choices.
+SAMPLES = ["", " ", "\t", "  \n", "x", "abc", "ab", "abcd", "1234", "12345", "123456789", "1234567890", "12.5", "1e3",
+           "0x10", "٣", "+88831234", " 88831234", "88831234 ", "8883123", "88830000", "88839999", "88840000",
+           "88111234", "88121234", "88131234", "88141234", "88151234", "88851234", "88881234", "88841234",
+           "199999", "200000", "500000", "500001", "-1", "a@b.com", "bad@", "x@y", "a@b@c.com", "ü@ex.com",
+           "https://x.com", "http://", "http://localhost", "ftp://1.2.3.4:80/p?q", "x.com", "AB CD", "AB  CD",
+           "AB-CD", " AB", "AB ", "ABCDEFGHIJKLMNOPQ", "ABCDEFGHIJKLMNOP", "1", "2", "4", "5", "None", "true", "false",
+           "TRUE", "ESF", "FISProfile", "esf", "TN", "POP", "TN_POP", "tn", "é"]
+
+
+def valid_row(name):
+    return dict({field: VALID[field] for field in PRODUCTS[name].fields if field in VALID}, home_id=HOME_IDS[name])
+
+
+# Rows built from a valid one: each field missing, then each field set to each sample value, then random mixes.
+def rows_for(name):
+    product = PRODUCTS[name]
+    base = valid_row(name)
+    rows = [base]
+    for field in product.fields:
+        rows.append({key: value for key, value in base.items() if key != field})
+        rows += [dict(base, **{field: sample}) for sample in SAMPLES]
+    generator = random.Random(name)
+    for _ in range(500):
+        row = dict(base)
+        for field in generator.sample(product.fields, generator.choice([1, 2, 3])):
+            if generator.random() < 0.2:
+                del row[field]
+            else:
+                row[field] = generator.choice(SAMPLES)
+        rows.append(row)
+    return rows
+
+
+# What the form page reports for a row: the WTForms errors in field order, or the product's rejection when the
+# form is valid but no template applies (the TN prefix check of tn_decommission).
+def wtforms_errors(product, row):
+    form = product.form(formdata=MultiDict(row), meta={"csrf": False})
+    if not form.validate():
+        return [(field, message) for field, messages in form.errors.items() for message in messages]
+    if product.templates.get(product.variant(row)) is None:
+        return [product.rejection[:2]]
+    return []
+
+
+@pytest.mark.parametrize("name", list(PRODUCTS))
+def test_bulk_validator_matches_wtforms(name):
+    product = PRODUCTS[name]
+    rows = rows_for(name)
+    with main.app.test_request_context():
+        expected = [wtforms_errors(product, row) for row in rows]
+    assert product.bulk_validator.validate(rows) == expected
+    assert [] in expected and any(expected)
+
+
+def test_tn_prefix_outside_series_is_rejected():
+    rows = [dict(valid_row("tn"), home_id=home_id) for home_id in ("88111234", "88121234", "88131234", "88141234")]
+    assert PRODUCTS["tn"].bulk_validator.validate(rows) == [
+        [], [], [("home_id", "Incorrect home id series.")], []]
+
+
+def test_missing_email_takes_the_form_default():
+    row = valid_row("zelle")
+    del row["csr_email"]
+    assert PRODUCTS["zelle"].bulk_validator.validate([row]) == [[]]
+    assert PRODUCTS["zelle"].bulk_validator.values(row)["csr_email"] == "donotreply_banking@fiserv.com"
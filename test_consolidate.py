@@ -0,0 +1,165 @@
+import csv
+import io
+import random
+import re
+import sqlite3
+import zipfile
+
+import pytest
+
+import main
+from consolidate import ConsolidationError, consolidated_sql
+from products import PRODUCTS
+
+COMMON = """-- Decommission &&fi_name (bug &&bug_id); don't run twice
+UPDATE fi SET status = 'DECOMMISSIONED', bug = &&bug_id WHERE home_id = &&home_id;
+DELETE FROM session WHERE home_id = &&home_id;
+UPDATE fi SET name = '&&fi_name - DECOM'
+ WHERE home_id = &&home_id;
+INSERT INTO audit (home_id, note) VALUES (&&home_id, 'decom &&bug_id; done');
+/* once per FI, not idempotent */
+UPDATE counters SET n = n + 1;
+INSERT INTO audit (home_id, note) VALUES (NULL, 'BUG &&bug_id');
+UPDATE fi SET touched = touched + 1 WHERE home_id = &&home_id;
+UPDATE settings SET value = 'off' WHERE name = 'legacy';
+"""
+
+TEMPLATES = {
+    "rxp.sql": COMMON + "UPDATE sponsor SET active = 'N' WHERE sponsor_id = '&&sponsor_id' AND home_id = &&home_id;\n"
+                        "COMMIT;\n/\n",
+    "tn.sql": COMMON + "UPDATE fi SET kind = 'tn' WHERE home_id=&&home_id AND status = 'DECOMMISSIONED';\ncommit;\n",
+    "di_tn.sql": COMMON + "UPDATE fi SET kind = 'di_tn' WHERE home_id = &&home_id;\nCOMMIT;",
+    "di_pop.sql": COMMON + "UPDATE fi SET kind = 'di_pop' WHERE home_id = &&home_id;\nCOMMIT;",
+    "di_tn_pop.sql": COMMON + "UPDATE fi SET kind = 'di_tn_pop' WHERE home_id = &&home_id;\nCOMMIT;",
+    "rol.sql": COMMON + "DELETE FROM routing WHERE rtn = '&&rtn';\n"
+                        "UPDATE routing_map SET active = 'N' WHERE rtn = '&&rtn' AND home_id = &&home_id;\nCOMMIT;\n",
+}
+
+SCHEMA = """
+CREATE TABLE fi (home_id INTEGER, name TEXT, status TEXT, bug INTEGER, kind TEXT, touched INTEGER);
+CREATE TABLE session (home_id INTEGER, x TEXT);
+CREATE TABLE audit (home_id INTEGER, note TEXT);
+CREATE TABLE counters (n INTEGER);
+CREATE TABLE settings (name TEXT, value TEXT);
+CREATE TABLE sponsor (sponsor_id TEXT, home_id INTEGER, active TEXT);
+CREATE TABLE routing (rtn TEXT, home_id INTEGER);
+CREATE TABLE routing_map (rtn TEXT, home_id INTEGER, active TEXT);
+INSERT INTO counters VALUES (0);
+INSERT INTO settings VALUES ('legacy', 'on');
+"""
+
+SERIES = {"rxp": (88830000, 88839999), "tn": (88100000, 88199999), "di": (88880000, 88889999),
+          "rol": (88840000, 88849999)}
+
+
+def database(home_ids):
+    connection = sqlite3.connect(":memory:")
+    connection.executescript(SCHEMA)
+    for home_id in home_ids:
+        connection.execute("INSERT INTO fi VALUES (?, 'n', 'ACTIVE', NULL, NULL, 0)", (home_id,))
+        connection.execute("INSERT INTO session VALUES (?, 's')", (home_id,))
+        connection.execute("INSERT INTO sponsor VALUES (?, ?, 'Y')", (f"S{home_id % 13}", home_id))
+        connection.execute("INSERT INTO routing VALUES (?, ?)", (f"{home_id % 17:09d}", home_id))
+        connection.execute("INSERT INTO routing_map VALUES (?, ?, 'Y')", (f"{home_id % 17:09d}", home_id))
+    connection.commit()
+    return connection
+
+
+# SQLite has no SQL*Plus `/` lines, and the scripts' COMMITs need an open transaction.
+def run(connection, script):
+    connection.executescript("BEGIN;\n" + re.sub(r"(?m)^/$", "", script))
+    return sorted(connection.iterdump())
+
+
+@pytest.fixture
+def client(sql_files, monkeypatch):
+    for name, text in TEMPLATES.items():
+        (sql_files / name).write_text(text)
+    monkeypatch.setattr(main, "consolidated_in_list_size", 7)
+    return main.app.test_client()
+
+
+def batch_rows(name, generator):
+    low, high = SERIES[name]
+    home_ids = generator.sample(range(low, high), 60)
+    if name == "tn":
+        home_ids = [int(prefix + str(home_id)[4:])
+                    for home_id, prefix in zip(home_ids, generator.choices(["8811", "8812", "8814", "8813"], k=60))]
+    rows = [dict(home_id=str(home_id), fi_name=generator.choice(["Bank A", "Bank B"]),
+                 bug_id=generator.choice(["412345", "412346"]), sponsor_id=f"S{home_id % 13}",
+                 rtn=f"{home_id % 17:09d}", product=generator.choice(["TN", "POP", "TN_POP"]))
+            for home_id in home_ids[:40]]
+    # An exact duplicate (dropped), the same FI under another name (kept: its statements run twice per FI too)
+    # and an invalid row.
+    rows += [dict(rows[0]), dict(rows[1], fi_name="Renamed Bank"), dict(home_id="1", fi_name="x", bug_id="1")]
+    return home_ids, rows
+
+
+@pytest.mark.parametrize("name", list(SERIES))
+def test_consolidated_script_matches_per_fi_scripts(client, name):
+    product = PRODUCTS[name]
+    home_ids, rows = batch_rows(name, random.Random(name))
+    response = client.post(f"/batch/{name}?output=consolidated", json=rows)
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    report = list(csv.reader(io.StringIO(archive.read("errors.csv").decode())))
+    script = archive.read(f"{name}_consolidated.sql").decode()
+    accepted = [row for row, line in zip(rows, report[1:]) if line[1] == "ok"]
+    assert len(accepted) >= 30
+
+    per_fi = database(home_ids)
+    for row in accepted:
+        per_fi_dump = run(per_fi, product.generate(product.bulk_validator.values(row))[1])
+    assert run(database(home_ids), script) == per_fi_dump
+    assert len(re.findall(r"(?im)^commit;$", script)) == 1
+    assert len(re.findall(r"(?m)^UPDATE counters SET n = n \+ 1;$", script)) == len(accepted)
+
+
+def test_repeated_keys_run_once_per_row(sql_files):
+    (sql_files / "rxp.sql").write_text("UPDATE fi SET touched = touched + 1 WHERE home_id = &&home_id;\nCOMMIT;\n")
+    rows = [{"&&home_id": home_id} for home_id in ("1", "2", "1", "3", "1")]
+    script = consolidated_sql([("sql_files/rxp.sql", rows)], in_list_size=2)
+    assert re.findall(r"(?m)^UPDATE.*;$", script) == [
+        "UPDATE fi SET touched = touched + 1 WHERE home_id IN (1, 2);",
+        "UPDATE fi SET touched = touched + 1 WHERE home_id = 3;",
+        "UPDATE fi SET touched = touched + 1 WHERE home_id = 1;",
+        "UPDATE fi SET touched = touched + 1 WHERE home_id = 1;",
+    ]
+
+
+# A key placeholder assigned in a SET clause (or inside a string after WHERE) is not a filter: the statement
+# runs once per row.
+def test_keys_outside_a_filter_clause_are_not_merged(sql_files):
+    (sql_files / "rxp.sql").write_text("UPDATE registry SET last_decommissioned = &&home_id WHERE region = 'US';\n"
+                                       "UPDATE fi SET note = 'on hold' WHERE home_id = &&home_id;\nCOMMIT;\n")
+    rows = [{"&&home_id": home_id} for home_id in ("1", "2")]
+    script = consolidated_sql([("sql_files/rxp.sql", rows)])
+    assert re.findall(r"(?m)^UPDATE.*;$", script) == [
+        "UPDATE registry SET last_decommissioned = 1 WHERE region = 'US';",
+        "UPDATE registry SET last_decommissioned = 2 WHERE region = 'US';",
+        "UPDATE fi SET note = 'on hold' WHERE home_id IN (1, 2);",
+    ]
+
+
+def test_exit_runs_once_after_the_commit(sql_files):
+    (sql_files / "rxp.sql").write_text("UPDATE fi SET status = 'D' WHERE home_id = &&home_id;\nCOMMIT;\n"
+                                       "EXIT SQL.SQLCODE\n")
+    (sql_files / "tn.sql").write_text("UPDATE fi SET kind = 'tn' WHERE home_id = &&home_id;\nCOMMIT;\nquit;\n")
+    script = consolidated_sql([("sql_files/rxp.sql", [{"&&home_id": "1"}, {"&&home_id": "2"}]),
+                               ("sql_files/tn.sql", [{"&&home_id": "3"}])])
+    assert script.endswith("WHERE home_id = 3;\n\nCOMMIT;\nEXIT SQL.SQLCODE;\n")
+    assert len(re.findall(r"(?im)^(exit|quit)\b", script)) == 1
+
+
+@pytest.mark.parametrize("statement", ["CREATE TABLE fi_backup AS SELECT * FROM fi WHERE home_id = &&home_id",
+                                       "BEGIN\n  purge_fi(&&home_id);\nEND",
+                                       "drop table fi_&&home_id", "EXIT"])
+def test_templates_that_cannot_share_a_transaction_are_rejected(client, sql_files, statement):
+    (sql_files / "rxp.sql").write_text(f"{statement};\nUPDATE fi SET status = 'D' WHERE home_id = &&home_id;\n"
+                                       "COMMIT;\n")
+    with pytest.raises(ConsolidationError, match="sql_files/rxp.sql"):
+        consolidated_sql([("sql_files/rxp.sql", [{"&&home_id": "1"}])])
+    response = client.post("/batch/rxp?output=consolidated",
+                           json=[{"home_id": "88831234", "fi_name": "B", "sponsor_id": "S", "bug_id": "412345"}])
+    assert response.status_code == 400
+    assert b"cannot run inside a single transaction" in response.data
@@ -0,0 +1,129 @@
+import csv
+import gzip
+import hashlib
+import io
+import os
+import re
+import time
+import zipfile
+
+import pytest
+
+import history
+import main
+from history import HistoryStore
+from jobs import JobManager
+from script_store import ScriptStore
+
+RXP_FORM = {"home_id": "88831234", "fi_name": "Bank", "sponsor_id": "SP01", "bug_id": "412345"}
+
+
+@pytest.fixture
+def client(sql_files, monkeypatch):
+    monkeypatch.setitem(main.app.config, "WTF_CSRF_ENABLED", False)
+    (sql_files / "rxp.sql").write_text("UPDATE fi SET status = 'D', name = '&&fi_name' WHERE home_id = &&home_id;\n"
+                                       "UPDATE sponsor SET active = 'N' WHERE sponsor_id = '&&sponsor_id';\n"
+                                       "-- bug &&bug_id\nCOMMIT;\n")
+    return main.app.test_client()
+
+
+def download_url(response):
+    return re.search(r'/download/[^"\']+', response.get_data(as_text=True)).group(0)
+
+
+def test_script_too_large_for_memory_store_is_kept_on_disk(client, monkeypatch):
+    monkeypatch.setattr(main, "script_storage", "memory")
+    monkeypatch.setattr(main, "script_store", ScriptStore(max_bytes=64))
+    response = client.post("/RXP", data=RXP_FORM)
+    assert response.status_code == 200
+    download = client.get(download_url(response))
+    assert download.status_code == 200
+    assert download.data.decode() == main.rxp_script("88831234", "Bank", "SP01", "412345")[1]
+    assert len(main.script_store) == 0
+
+
+def test_memory_store_download(client, monkeypatch):
+    monkeypatch.setattr(main, "script_storage", "memory")
+    monkeypatch.setattr(main, "script_store", ScriptStore())
+    download = client.get(download_url(client.post("/RXP", data=RXP_FORM)))
+    assert download.status_code == 200
+    assert download.headers["Content-Length"] == str(len(download.data))
+    assert len(main.script_store) == 1
+    assert client.get("/download/unknown-token").status_code == 404
+
+
+def batch_report(response):
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    return archive, list(csv.reader(io.StringIO(archive.read("errors.csv").decode())))
+
+
+def test_batch_rejects_csv_that_is_not_utf8_before_streaming(client):
+    upload = "home_id,fi_name,sponsor_id,bug_id\n88831234,Bank,SP01,412345\n".encode("utf-16")
+    for url in ("/batch/rxp", "/jobs/rxp"):
+        response = client.post(url, data={"file": (io.BytesIO(upload), "rows.csv")})
+        assert response.status_code == 400
+
+
+def test_batch_reports_unreadable_csv_rows(client):
+    upload = (b"home_id,fi_name,sponsor_id,bug_id\n"
+              b"88831234,Bank,SP01,412345\n"
+              b"88831235,Caf\xe9 Bank,SP01,412345\n"
+              b"88831236,\"Bank\"x\",SP01,412345\n"
+              b"88831238," + b"x" * 200000 + b",SP01,412345\n"
+              b"88831237,Bank \xc3\xa9,SP01,412345\n")
+    response = client.post("/batch/rxp", data={"file": (io.BytesIO(upload), "rows.csv")})
+    assert response.status_code == 200
+    archive, report = batch_report(response)
+    assert [row[1] for row in report[1:]] == ["ok", "error", "ok", "error", "ok"]
+    assert report[2][3] == "row: CSV row at line 3 is not valid UTF-8."
+    assert report[4][3].startswith("row: Malformed CSV row: field larger than field limit")
+    assert sorted(archive.namelist()) == ["errors.csv"] + sorted(
+        f"update_decommission_rxp_{home_id}_bug412345.sql" for home_id in ("88831234", "88831236", "88831237"))
+
+
+def test_batch_history_records_only_scripts_in_the_archive(client):
+    rows = [dict(RXP_FORM, home_id=home_id) for home_id in ("88835001", "88835002", "88835001", "88835001")]
+    archive, report = batch_report(client.post("/batch/rxp", json=rows))
+    assert [row[1] for row in report[1:]] == ["ok", "ok", "error", "error"]
+    for home_id in ("88835001", "88835002"):
+        entries, _ = main.history.search({"home_id": int(home_id)})
+        script_file = f"update_decommission_rxp_{home_id}_bug412345.sql"
+        assert [(entry["script_file"], entry["sha256"]) for entry in entries] == [
+            (script_file, hashlib.sha256(archive.read(script_file)).hexdigest())]
+
+
+def test_disk_download_is_gzipped_as_a_stream_and_revalidates(client, sql_files):
+    (sql_files / "rxp.sql").write_text("UPDATE fi SET name = '&&fi_name' WHERE home_id = &&home_id;\n" * 200)
+    url = download_url(client.post("/RXP", data=RXP_FORM))
+    plain = client.get(url)
+    compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.is_streamed and "Content-Length" not in compressed.headers
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    revalidated = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+
+
+def test_expired_job_results_are_removed_when_polled(tmp_path):
+    manager = JobManager(ttl=0, result_dir=str(tmp_path))
+    job = manager.submit("rxp", 1, lambda job, result_file: result_file.write(b"zip"))
+    while job.finished_at is None:
+        time.sleep(0.01)
+    assert os.path.exists(job.result_path)
+    time.sleep(0.01)
+    assert manager.get(job.id) is None
+    assert not os.path.exists(job.result_path)
+
+
+def test_history_keeps_the_newest_rows_within_its_ttl(tmp_path, monkeypatch):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"), max_rows=3, ttl=60)
+    now = 1_000_000.0
+    monkeypatch.setattr(history.time, "time", lambda: now)
+    for home_id in range(88835001, 88835006):
+        store.record([("rxp", dict(RXP_FORM, home_id=str(home_id)), f"{home_id}.sql", "COMMIT;\n")])
+    assert [entry["home_id"] for entry in store.search()[0]] == [88835005, 88835004, 88835003]
+    now += 61
+    store.record([("rxp", RXP_FORM, "88831234.sql", "COMMIT;\n")])
+    assert [entry["home_id"] for entry in store.search()[0]] == [88831234]
@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+import main
+from sql_template import BUG_ID, CERT_DOMAIN, CERT_ORG, CONNECTIVITY, CSR_EMAIL, CSR_PHONE, CUSTOM_DOMAIN, DANAL, \
+    FI_NAME, HOME_ID, HOME_PAGE, ACH, PARTNER_ID, PLACEHOLDERS, POD_NUMBER, PROD_DOMAIN, PROD_ORG, QA_ORG, \
+    REPLY_EMAIL, RTN, SPONSOR_ID, STAGE_ORG, VERID, SqlTemplate
+
+# Every placeholder in statements, next to each other, glued to word characters and `&`s, and at both ends of the
+# file; each product's template also carries the placeholders of the other products, which it must leave alone.
+TEMPLATE = (HOME_ID + "-- bug " + BUG_ID + " for " + FI_NAME + "\n"
+            + "".join(f"UPDATE pct_config SET value = '{placeholder}' WHERE home_id = {HOME_ID} "
+                      f"AND key = '{placeholder[2:]}';\n" for placeholder in PLACEHOLDERS)
+            + HOME_ID + FI_NAME + BUG_ID + " &&&&" + RTN + " " + RTN + "x x" + SPONSOR_ID + "_1 &&HOME_ID &&home &&\n"
+            + "INSERT INTO audit VALUES ('" + CSR_EMAIL + REPLY_EMAIL + "', '" + PROD_ORG + PROD_DOMAIN + "');\n"
+            + BUG_ID)
+
+# Template file and the replace() chain of the original *_script functions, in their order, per product.
+LEGACY = {
+    "rxp": ({None: "rxp.sql"}, (HOME_ID, FI_NAME, SPONSOR_ID, BUG_ID)),
+    "tn": ({"8812": "tn.sql", "8814": "tn.sql", "8811": "tn.sql"}, (HOME_ID, FI_NAME, BUG_ID)),
+    "di": ({"TN": "di_tn.sql", "POP": "di_pop.sql", "TN_POP": "di_tn_pop.sql"}, (HOME_ID, FI_NAME, BUG_ID)),
+    "rol": ({None: "rol.sql"}, (HOME_ID, FI_NAME, RTN, BUG_ID)),
+    "zelle": ({None: "zelle_default.sql"},
+              (HOME_ID, FI_NAME, PARTNER_ID, RTN, BUG_ID, CSR_EMAIL, REPLY_EMAIL, CSR_PHONE, HOME_PAGE, ACH, QA_ORG,
+               CERT_ORG, STAGE_ORG, PROD_ORG, POD_NUMBER, CERT_DOMAIN, PROD_DOMAIN, DANAL, VERID, CUSTOM_DOMAIN,
+               CONNECTIVITY)),
+    "rxp_zelle": ({None: "rxp_zelle.sql"},
+                  (HOME_ID, FI_NAME, BUG_ID, HOME_PAGE, QA_ORG, CERT_ORG, STAGE_ORG, PROD_ORG, POD_NUMBER, CERT_DOMAIN,
+                   PROD_DOMAIN, DANAL, CUSTOM_DOMAIN, CONNECTIVITY)),
+}
+
+# Output names of the original *_script functions.
+LEGACY_FILENAMES = {
+    ("rxp", None): "update_decommission_rxp_{home_id}_bug{bug_id}.sql",
+    ("tn", "8812"): "update_decommission_coasp_{home_id}_bug{bug_id}.sql",
+    ("tn", "8814"): "update_decommission_architect_{home_id}_bug{bug_id}.sql",
+    ("tn", "8811"): "update_decommission_dna_{home_id}_bug{bug_id}.sql",
+    ("di", "TN"): "update_decommission_di_tn_{home_id}_bug{bug_id}.sql",
+    ("di", "POP"): "update_decommission_di_pop_{home_id}_bug{bug_id}.sql",
+    ("di", "TN_POP"): "update_decommission_di_tn_pop_{home_id}_bug{bug_id}.sql",
+    ("rol", None): "update_decommission_ro_{home_id}_bug{bug_id}.sql",
+    ("zelle", None): "enable_zelle_default_setup_{home_id}_bug{bug_id}.sql",
+    ("rxp_zelle", None): "enable_zelle_default_configurations_{home_id}_bug{bug_id}.sql",
+}
+
+VALUES = {
+    HOME_ID: "88831234", FI_NAME: "First Bank & Trust's \"FI\" – Zürich", SPONSOR_ID: "SP01", BUG_ID: "412345",
+    RTN: "123456789", PARTNER_ID: "1234", CSR_EMAIL: "csr@example.com", REPLY_EMAIL: "reply@example.com",
+    CSR_PHONE: "800-555-1234", HOME_PAGE: "https://www.example.com/?a=1&b=2", ACH: "FIRST BANK", QA_ORG: "QA1",
+    CERT_ORG: "CE1", STAGE_ORG: "ST1", PROD_ORG: "PR1", POD_NUMBER: "3",
+    CERT_DOMAIN: "https://cwp411-cert.checkfreeweb.com", PROD_DOMAIN: "https://cwp411.checkfreeweb.com",
+    DANAL: "DANAL1", VERID: "CashEdge:Development", CUSTOM_DOMAIN: "false", CONNECTIVITY: "DirectConnectISO",
+}
+
+HOME_IDS = {"rxp": "88831234", "tn": {"8812": "88121234", "8814": "88141234", "8811": "88111234"},
+            "di": "88881234", "rol": "88841234", "zelle": "88851234", "rxp_zelle": "88839876"}
+
+CASES = [(product, variant) for product, variant in LEGACY_FILENAMES]
+
+
+def legacy_script(product, variant, values):
+    templates, chain = LEGACY[product]
+    with open(f"sql_files/{templates[variant]}") as sql_file:
+        new_file = sql_file.read()
+    for placeholder in chain:
+        new_file = new_file.replace(placeholder, values[placeholder])
+    filename = LEGACY_FILENAMES[product, variant].format(home_id=values[HOME_ID], bug_id=values[BUG_ID])
+    return filename, new_file
+
+
+@pytest.fixture
+def templates(sql_files):
+    for name in {name for templates, _ in LEGACY.values() for name in templates.values()}:
+        (sql_files / name).write_text(TEMPLATE)
+    return sql_files
+
+
+@pytest.mark.parametrize("product,variant", CASES)
+def test_scripts_match_legacy_replace_chain(templates, product, variant):
+    home_id = HOME_IDS[product][variant] if product == "tn" else HOME_IDS[product]
+    values = dict(VALUES, **{HOME_ID: home_id})
+    script = getattr(main, f"{product}_script")
+    arguments = {field: values[placeholder] for placeholder, field in main.PRODUCTS[product].placeholders.items()}
+    if product == "di":
+        arguments["product"] = variant
+    assert script(*(arguments[name] for name in main.PRODUCTS[product].script_args)) == \
+        legacy_script(product, variant, values)
+
+
+def test_tn_prefix_outside_series_has_no_script(templates):
+    assert main.tn_script("88131234", "Bank", "412345") is None
+
+
+def test_edited_template_is_reloaded(sql_files):
+    template = sql_files / "rxp.sql"
+    template.write_text("DELETE FROM fi WHERE home_id = &&home_id;\n")
+    assert main.rxp_script("88831234", "Bank", "SP01", "412345")[1] == "DELETE FROM fi WHERE home_id = 88831234;\n"
+    template.write_text("UPDATE fi SET name = '&&fi_name' WHERE home_id = &&home_id;\n")
+    mtime = template.stat().st_mtime_ns + 1_000_000_000
+    os.utime(template, ns=(mtime, mtime))
+    assert main.rxp_script("88831234", "Bank", "SP01", "412345")[1] == \
+        "UPDATE fi SET name = 'Bank' WHERE home_id = 88831234;\n"
+
+
+def test_missing_values_are_left_in_place():
+    assert SqlTemplate("a &&home_id b &&rtn c").render({HOME_ID: "1"}) == "a 1 b &&rtn c"
+
+
+# The one intended difference from the replace chains: a value is never substituted again, so placeholder text
+# typed into a field reaches the script as typed.
+def test_placeholder_text_in_values_is_not_substituted(sql_files):
+    (sql_files / "rxp.sql").write_text("-- &&fi_name / &&bug_id\n")
+    values = dict(VALUES, **{FI_NAME: "A &&bug_id", HOME_ID: "88831234"})
+    assert legacy_script("rxp", None, values)[1] == "-- A 412345 / 412345\n"
+    assert main.rxp_script("88831234", "A &&bug_id", "SP01", "412345")[1] == "-- A &&bug_id / 412345\n"
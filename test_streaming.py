@@ -0,0 +1,84 @@
+import hashlib
+import io
+import tracemalloc
+import zipfile
+
+import pytest
+
+import batch
+import sql_template
+from batch import stream_zip
+from products import PRODUCTS
+
+CHUNK_SIZE = 64 * 1024
+ZELLE = {"home_id": "88851234", "fi_name": "Bank", "partner_id": "1234", "rtn": "123456789", "bug_id": "412345",
+         "csr_email": "csr@example.com", "reply_email": "reply@example.com", "csr_phone": "8005551234",
+         "home_page": "https://www.example.com", "ach": "BANK", "qa_org": "QA1", "cert_org": "CE1",
+         "stage_org": "ST1", "prod_org": "PR1", "pod_number": "1", "cert_domain": "https://cert.example.com",
+         "prod_domain": "https://prod.example.com", "danal": "DANAL1", "verid": "CashEdge:Development",
+         "custom_domain": "true", "instant_connectivity": "ESF"}
+# One statement per placeholder, repeated for many environments: a script of about 4 MB.
+STATEMENTS = "".join(f"UPDATE zelle_config SET value = '{placeholder}' WHERE home_id = &&home_id "
+                     f"AND env = 'ENV_{{environment}}' AND key = '{placeholder[2:]}';\n"
+                     for placeholder in PRODUCTS["zelle"].placeholders)
+
+
+@pytest.fixture
+def zelle(sql_files):
+    (sql_files / "zelle_default.sql").write_text(
+        "".join(STATEMENTS.format(environment=environment) for environment in range(1700)) + "COMMIT;\n")
+    # Loaded before measuring: the compiled template is shared by all requests, not allocated by one.
+    sql_template.template_cache.get("sql_files/zelle_default.sql")
+    return PRODUCTS["zelle"]
+
+
+def peak_allocation(operation):
+    tracemalloc.start()
+    try:
+        operation()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streamed_script_stays_within_the_chunk_bound(zelle):
+    digest = hashlib.sha256()
+
+    def stream():
+        for chunk in zelle.stream(ZELLE, CHUNK_SIZE)[1]:
+            digest.update(chunk.encode())
+
+    peak = peak_allocation(stream)
+    script = zelle.generate(ZELLE)[1]
+    assert len(script) > 4_000_000
+    assert digest.hexdigest() == hashlib.sha256(script.encode()).hexdigest()
+    assert peak < 8 * CHUNK_SIZE
+    assert peak_allocation(lambda: zelle.generate(dict(ZELLE, bug_id="412346"))) > len(script)
+
+
+def test_streamed_zip_member_stays_within_the_chunk_bound(zelle):
+    archive = io.BytesIO()
+
+    def write_zip():
+        for data in stream_zip([(zelle.stream(ZELLE, CHUNK_SIZE), [])]):
+            archive.write(data)
+
+    # The compressor's own state is a few hundred kilobytes on top of the chunks.
+    assert peak_allocation(write_zip) < 8 * CHUNK_SIZE + 512 * 1024
+    script_file, script = zelle.generate(ZELLE)
+    assert zipfile.ZipFile(archive).read(script_file).decode() == script
+
+
+def test_error_report_is_spooled_to_disk(monkeypatch):
+    monkeypatch.setattr(batch, "REPORT_SPOOL_SIZE", 4096)
+    rows = ((None, [("home_id", f"Row {number} is invalid. " + "x" * 100)]) for number in range(20000))
+    archive = io.BytesIO()
+
+    def write_zip():
+        for data in stream_zip(rows):
+            archive.write(data)
+
+    assert peak_allocation(write_zip) < 8 * CHUNK_SIZE + 512 * 1024
+    report = zipfile.ZipFile(archive).read("errors.csv").decode().splitlines()
+    assert len(report) == 20001
+    assert report[-1].startswith("20000,error,,home_id: Row 19999 is invalid.")
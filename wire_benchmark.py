@@ -0,0 +1,97 @@
+import argparse
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmark import APP_DIR, FORMS, write_templates
+
+# Bytes on the wire and response time per user-visible scenario, before and after compression and caching:
+# "before" requests everything uncompressed and revalidates static files the way it did with plain /static URLs,
+# "after" sends Accept-Encoding: gzip and uses ETags and the immutable /assets URLs. The latency estimate adds the
+# measured server time to one round trip per request and the transfer time at the given bandwidth.
+
+
+def wire_size(response):
+    headers = sum(len(name) + len(value) + 4 for name, value in response.headers.items())
+    return len(f"HTTP/1.1 {response.status}\r\n") + headers + 2 + len(response.get_data())
+
+
+def timed(requests, iterations):
+    times = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        responses = [request() for request in requests]
+        times.append(time.perf_counter() - started)
+    return sum(wire_size(response) for response in responses), len(requests), statistics.median(times)
+
+
+def scenarios(client):
+    gzip = {"Accept-Encoding": "gzip"}
+    page = client.get("/", headers=gzip)
+    assets = re.findall(r'href="(/assets/[^"]+)"', page.get_data(as_text=True))
+    zelle = client.get("/zelle", headers=gzip)
+    download = client.post("/zelle", data=FORMS["zelle"]).get_data(as_text=True)
+    download_url = re.search(r'/download/[^"\']+', download).group(0)
+    revalidate = {"If-Modified-Since": client.get("/static/css/styles.css").headers["Last-Modified"]}
+    rows = [dict(FORMS["rxp"], home_id=str(88830000 + number)) for number in range(50)]
+    return {
+        "first visit (index + css + favicon)": (
+            [lambda: client.get("/"), lambda: client.get("/static/css/styles.css"),
+             lambda: client.get("/static/images/favicon.ico")],
+            [lambda: client.get("/", headers=gzip)]
+            + [lambda url=url: client.get(url, headers=gzip) for url in assets]),
+        "repeat visit (index + css + favicon)": (
+            [lambda: client.get("/"),
+             lambda: client.get("/static/css/styles.css", headers=revalidate),
+             lambda: client.get("/static/images/favicon.ico", headers=revalidate)],
+            [lambda: client.get("/", headers=dict(gzip, **{"If-None-Match": page.headers["ETag"]}))]),
+        "repeat visit (zelle form)": (
+            [lambda: client.get("/zelle")],
+            [lambda: client.get("/zelle", headers=dict(gzip, **{"If-None-Match": zelle.headers["ETag"]}))]),
+        "zelle script download": (
+            [lambda: client.get(download_url)], [lambda: client.get(download_url, headers=gzip)]),
+        "JSON API, 50 RXP rows": (
+            [lambda: client.post("/api/v1/rxp", json=rows)],
+            [lambda: client.post("/api/v1/rxp", json=rows, headers=gzip)]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bytes on the wire with and without compression/caching.")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--bandwidth-mbps", type=float, default=10.0)
+    parser.add_argument("--rtt-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="pct_wire_")
+    try:
+        write_templates(os.path.join(work_dir, "sql_files"))
+        os.environ["ARTIFACT_DIR"] = os.path.join(work_dir, "generated")
+        os.environ["HISTORY_DB"] = os.path.join(work_dir, "history.sqlite3")
+        os.chdir(work_dir)
+        sys.path.insert(0, APP_DIR)
+        import main as app_module
+        app_module.app.config["WTF_CSRF_ENABLED"] = False
+        client = app_module.app.test_client()
+
+        print(f"{'scenario':38} {'bytes before':>12} {'after':>8} {'server ms':>15} {'est. latency ms':>17}")
+        for name, (before, after) in scenarios(client).items():
+            row = []
+            for requests in (before, after):
+                size, count, seconds = timed(requests, args.iterations)
+                latency = seconds * 1000 + count * args.rtt_ms + size * 8 / (args.bandwidth_mbps * 1000)
+                row.append((size, seconds * 1000, latency))
+            (size_before, server_before, latency_before), (size_after, server_after, latency_after) = row
+            print(f"{name:38} {size_before:>12} {size_after:>8} {server_before:>7.2f} {server_after:>7.2f} "
+                  f"{latency_before:>8.1f} {latency_after:>8.1f}")
+    finally:
+        os.chdir(APP_DIR)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()